@@ -1,3 +1,293 @@
+import sys
+
+import numpy as np
+
+
+class Ragged:
+    # list of lists stored as one flat array, row i is values[offsets[i]:offsets[i + 1]]
+    __slots__ = ("offsets", "values")
+
+    def __init__(self, offsets, values):
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def from_lists(cls, lists, dtype=None):
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in lists], out=offsets[1:])
+        values = np.array([x for row in lists for x in row], dtype=dtype)
+        return cls(offsets, values)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def row_of_value(self):
+        # row number of every flat value, handy for np.add.at / bincount
+        return np.repeat(np.arange(len(self)), self.lengths())
+
+    def tolist(self):
+        return [self[i].tolist() for i in range(len(self))]
+
+
+class OperationTable:
+    # one row per routing step of every part, CSR offsets per part
+    __slots__ = ("offsets", "route", "setup_time", "process_time", "idle_time",
+                 "avg_idle_time", "total_machine_time_all_parts")
+    fields = __slots__[1:]
+
+    @classmethod
+    def from_ordered_part(cls, ordered_part):
+        table = cls()
+        route = Ragged.from_lists(ordered_part.route, dtype=str)
+        table.offsets = route.offsets
+        table.route = route.values
+        for field in cls.fields[1:]:
+            column = Ragged.from_lists(getattr(ordered_part, field), dtype=np.float64)
+            if not np.array_equal(column.offsets, table.offsets):
+                raise ValueError(f"{field} does not have one value per routing step")
+            setattr(table, field, column.values)
+        return table
+
+    def __len__(self):
+        return len(self.route)
+
+    def column(self, field):
+        return Ragged(self.offsets, getattr(self, field))
+
+    def part_of_operation(self):
+        return np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+
+class OrderTable:
+    # every order a part has to be made for, own orders first and then the ones
+    # inherited from its parents (the nested lists assign_sub_part_data_to_class makes)
+    __slots__ = ("offsets", "part", "source_part", "order_number", "order_date",
+                 "delivery_date", "days_to_produce", "parts_per_day")
+
+    @classmethod
+    def from_orders(cls, orders, part_id):
+        part_index = {}
+        for i, p_id in enumerate(part_id):
+            part_index.setdefault(p_id, i)
+
+        # (part the demand is for, part the order was placed on, order row of that part)
+        rows = []
+
+        def collect(i, j):
+            for r in range(orders.number_of_orders[j]):
+                rows.append((i, j, r))
+            for parent in orders.parent_part_id[j]:
+                collect(i, part_index[parent])
+
+        for i in range(len(part_id)):
+            collect(i, i)
+        rows = np.array(rows, dtype=np.int64).reshape(-1, 3)
+        part, source, row = rows[:, 0], rows[:, 1], rows[:, 2]
+
+        table = cls()
+        table.offsets = np.zeros(len(part_id) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(part, minlength=len(part_id)), out=table.offsets[1:])
+        table.part = part
+        table.source_part = source
+
+        def own(field, dtype):
+            return np.array([getattr(orders, field)[s][r] for s, r in zip(source, row)], dtype=dtype)
+
+        table.order_number = own("order_number", np.int64)
+        table.order_date = own("order_date", "datetime64[D]")
+        table.delivery_date = own("delivery_date", "datetime64[D]")
+        table.days_to_produce = own("days_to_produce", np.int64)
+        table.parts_per_day = own("parts_per_day", np.float64)
+        return table
+
+    def __len__(self):
+        return len(self.part)
+
+    def column(self, field):
+        return Ragged(self.offsets, getattr(self, field))
+
+
+class DemandIndex:
+    # part x (route, step) time per piece and setup time, built once at load; the part x
+    # machine type matrices are the same numbers summed over the steps on each machine,
+    # so OEE, the daily planning and any new report are a matrix product against these
+    __slots__ = ("machine_id", "n_routes", "n_steps", "step_machine", "piece_time", "process_time",
+                 "setup_time", "piece_time_by_machine", "process_time_by_machine", "setup_time_by_machine")
+
+    @classmethod
+    def from_ordered_part(cls, ordered_part, yields=None):
+        # yields (yield_model.YieldModel) inflates the times for scrap, rework and startup defects
+        operations = ordered_part.operations
+        part = operations.part_of_operation()
+        step = np.arange(len(operations)) - operations.offsets[part]
+        route = np.asarray(ordered_part.route_number)[part]
+
+        index = cls()
+        index.machine_id = list(dict.fromkeys(operations.route.tolist()))
+        index.n_routes = int(np.max(route)) + 1 if len(route) else 0
+        index.n_steps = int(np.max(np.diff(operations.offsets))) if len(route) else 0
+
+        column = route * index.n_steps + step
+        machine_index = {m: k for k, m in enumerate(index.machine_id)}
+        index.step_machine = np.full(index.n_routes * index.n_steps, -1)
+        index.step_machine[column] = [machine_index[m] for m in operations.route]
+
+        shape = (len(ordered_part.part_id), index.n_routes * index.n_steps)
+        index.piece_time = np.zeros(shape)
+        index.process_time = np.zeros(shape)
+        index.setup_time = np.zeros(shape)
+        if yields is None:
+            index.piece_time[part, column] = operations.avg_idle_time + operations.process_time
+            index.process_time[part, column] = operations.process_time
+            index.setup_time[part, column] = operations.setup_time
+        else:
+            index.piece_time[part, column] = yields.piece_time(operations.avg_idle_time, operations.process_time)
+            index.process_time[part, column] = operations.process_time * yields.time_factor
+            index.setup_time[part, column] = operations.setup_time + yields.startup_hours
+
+        step_to_machine = index.step_to_machine()
+        index.piece_time_by_machine = index.piece_time @ step_to_machine
+        index.process_time_by_machine = index.process_time @ step_to_machine
+        index.setup_time_by_machine = index.setup_time @ step_to_machine
+        return index
+
+    def step_to_machine(self):
+        # (route, step) x machine type 0/1 matrix
+        matrix = np.zeros((len(self.step_machine), len(self.machine_id)))
+        used = self.step_machine >= 0
+        matrix[np.flatnonzero(used), self.step_machine[used]] = 1
+        return matrix
+
+    def machine_columns(self, machine_id):
+        # positions of the given machine types in the *_by_machine matrices, -1 when unused
+        return np.array([self.machine_id.index(m) if m in self.machine_id else -1 for m in machine_id])
+
+    def by_machine(self, matrix, machine_id):
+        # part x machine type matrix in the order of machine_id, zero for unused machine types
+        columns = self.machine_columns(machine_id)
+        result = np.zeros((matrix.shape[0], len(machine_id)))
+        result[:, columns >= 0] = matrix[:, columns[columns >= 0]]
+        return result
+
+    def step_shares(self, machine_quantity):
+        # per (route, step) column the machine share of the hand made planning table, 1 for padding
+        shares = np.ones(self.n_routes * self.n_steps)
+        for r, steps in enumerate(machine_quantity):
+            shares[r * self.n_steps:r * self.n_steps + len(steps)] = steps
+        return shares
+
+
+def number_routes(routes):
+    # route number of every route in order of first appearance, and the unique routes as tuples
+    number = {}
+    route_number = [number.setdefault(tuple(route), len(number)) for route in routes]
+    return route_number, list(number)
+
+
+class RouteCatalog:
+    # the unique routes, built once at load: every part with the same route shares one tuple of
+    # interned machine names, the member parts per route are a CSR index and the step totals
+    # follow OrderedPart.set_total_quantity
+    __slots__ = ("routes", "number", "offsets", "members", "step_totals")
+
+    @classmethod
+    def from_ordered_part(cls, ordered_part):
+        route_number = np.asarray(ordered_part.route_number, dtype=np.int64)
+        operations = ordered_part.operations
+        n_routes = int(route_number.max()) + 1 if len(route_number) else 0
+
+        catalog = cls()
+        _, first = np.unique(route_number, return_index=True)
+        catalog.routes = [tuple(sys.intern(str(m)) for m in ordered_part.route[i]) for i in first]
+        catalog.number = {route: r for r, route in enumerate(catalog.routes)}
+        catalog.members = np.argsort(route_number, kind="stable")
+        catalog.offsets = np.zeros(n_routes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(route_number, minlength=n_routes), out=catalog.offsets[1:])
+
+        n_steps = max((len(route) for route in catalog.routes), default=0)
+        catalog.step_totals = np.zeros((n_routes, n_steps))
+        part = operations.part_of_operation()
+        step = np.arange(len(operations)) - operations.offsets[part]
+        np.add.at(catalog.step_totals, (route_number[part], step), operations.total_machine_time_all_parts)
+        return catalog
+
+    def __len__(self):
+        return len(self.routes)
+
+    def parts(self, r):
+        # indices of the parts on route r, in part order
+        return self.members[self.offsets[r]:self.offsets[r + 1]]
+
+    def step_total(self, r):
+        # machine hours per step of route r over all its parts
+        return self.step_totals[r, :len(self.routes[r])]
+
+    def add_step_times(self, route_number, step, hours):
+        np.add.at(self.step_totals, (route_number, step), hours)
+
+    def route_color_map(self):
+        # route number -> colour, the same route always gets the same colour
+        colours = palette()
+        return {r: colours[r % len(colours)] for r in range(len(self.routes))}
+
+    def machine_color_map(self, extra=()):
+        # machine type -> colour in order of first appearance over the routes, extra names
+        # (the "Done" node of the Sankeys) come after the machine types
+        colours = palette()
+        names = dict.fromkeys(m for route in self.routes for m in route)
+        names.update(dict.fromkeys(extra))
+        return {name: colours[i % len(colours)] for i, name in enumerate(names)}
+
+
+def palette():
+    from plotly.colors import qualitative
+    return qualitative.Plotly
+
+
+class PartRecord:
+    # light view on one part of a (compacted) OrderedPart
+    __slots__ = ("ordered_part", "index")
+
+    def __init__(self, ordered_part, index):
+        self.ordered_part = ordered_part
+        self.index = index
+
+    def __getattr__(self, name):
+        return getattr(self.ordered_part, name)[self.index]
+
+    @property
+    def orders(self):
+        table = self.ordered_part.orders.table
+        return [OrderRecord(table, row) for row in range(table.offsets[self.index], table.offsets[self.index + 1])]
+
+    def __repr__(self):
+        return f"PartRecord({self.part_id!r})"
+
+
+class OrderRecord:
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getattr__(self, name):
+        return getattr(self.table, name)[self.row]
+
+    def __repr__(self):
+        return f"OrderRecord({self.order_number}, part {self.part})"
+
+
 class Orders:
     def __init__(self):
         self.number_of_orders = []      # done
@@ -10,6 +300,14 @@ class Orders:
         self.quantity = []              # done
         self.parent_part_id = []        # done
         self.parent_quantity = []       # done
+
+    def use_table(self, table):
+        # the order lists become flat views per part, the nesting is gone
+        self.table = table
+        for field in ["order_number", "order_date", "delivery_date", "days_to_produce", "parts_per_day"]:
+            setattr(self, field, table.column(field))
+
+
 class OrderedPart:
     def __init__(self):
         self.part_id = []               # done
@@ -33,6 +331,63 @@ class OrderedPart:
 
         self.orders = Orders()
 
+    def compact(self):
+        # swaps the lists of lists for numpy columns, indexing like
+        # ordered_part.setup_time[idx][l] keeps working on the views
+        if getattr(self, "operations", None) is not None:
+            return self
+        self.price = np.asarray(self.price, dtype=np.float64)
+        self.max_transport_batch = np.asarray(self.max_transport_batch, dtype=np.float64)
+        self.total_time_all_parts = np.asarray(self.total_time_all_parts, dtype=np.float64)
+        self.total_quantity = np.asarray(self.total_quantity, dtype=np.int64)
+        self.route_number = np.asarray(self.route_number, dtype=np.int64)
+        self.is_main_assembly = np.asarray(self.is_main_assembly, dtype=bool)
+
+        self.use_columns(OperationTable.from_ordered_part(self), OrderTable.from_orders(self.orders, self.part_id))
+        return self
+
+    def use_columns(self, operations, order_table):
+        # points the old list attributes at views on the columnar tables
+        self.operations = operations
+        for field in OperationTable.fields:
+            setattr(self, field, operations.column(field))
+        self.orders.use_table(order_table)
+        self.demand_index = DemandIndex.from_ordered_part(self)
+        self.route_catalog = RouteCatalog.from_ordered_part(self)
+        return self
+
+    def set_total_quantity(self, parts, quantity):
+        # new total_quantity for the given parts, their machine times and the route totals of
+        # route_catalog follow without going over the other parts
+        parts = np.atleast_1d(np.asarray(parts, dtype=np.int64))
+        quantity = np.broadcast_to(np.asarray(quantity, dtype=np.int64), parts.shape)
+        operations = self.operations
+        # the columns of a memory-mapped snapshot are read only, the ones that change get a copy
+        if not operations.total_machine_time_all_parts.flags.writeable:
+            operations.total_machine_time_all_parts = operations.total_machine_time_all_parts.copy()
+            self.total_machine_time_all_parts = operations.column("total_machine_time_all_parts")
+        for field in ["total_quantity", "total_time_all_parts"]:
+            if not getattr(self, field).flags.writeable:
+                setattr(self, field, getattr(self, field).copy())
+        lengths = operations.offsets[parts + 1] - operations.offsets[parts]
+        step = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        op = np.repeat(operations.offsets[parts], lengths) + step
+
+        old = operations.total_machine_time_all_parts[op]
+        new = (np.repeat(quantity, lengths) * (operations.process_time[op] + operations.avg_idle_time[op])
+               + operations.setup_time[op])
+        operations.total_machine_time_all_parts[op] = new
+        self.total_quantity[parts] = quantity
+        self.total_time_all_parts[parts] = np.add.reduceat(new, np.cumsum(lengths) - lengths) if len(op) else 0
+        self.route_catalog.add_step_times(np.repeat(self.route_number[parts], lengths), step, new - old)
+        return self
+
+    def part(self, index):
+        return PartRecord(self, index)
+
+    def parts(self):
+        return [PartRecord(self, i) for i in range(len(self.part_id))]
+
 class Machine:
     def __init__(self):
         self.type_of_machine = []
@@ -41,4 +396,3 @@ class Machine:
         self.idle_time = []
         self.purchase_cost = []
 
-
@@ -1,13 +1,18 @@
 import pandas as pd
-from make_json_ordered_parts import *
+from make_json_ordered_parts import load_ordered_parts
+from daily_demand import planning_days
+from capacity import CapacityCalendar, process_hours_per_day
 
-df = pd.read_csv("../data/Order pattern.csv")
+MACHINE_INFORMATION_PATH = "../data/Machine information.csv"
 
-df["Order date"] = pd.to_datetime(df["Order date"])
-df["Desired delivery date"] = pd.to_datetime(df["Desired delivery date"])
 
-start_date = df["Order date"].min()
-end_date = df["Desired delivery date"].max()
+def read_machine_information(path=MACHINE_INFORMATION_PATH):
+    # first row of the sheet is a group header ("Quality"), the real header is the second one
+    df = pd.read_csv(path, header=1)
+    df.columns = [column.strip() for column in df.columns]
+    df = df.dropna(subset=["Machine code"]).set_index("Machine code")
+    return df
+
 
 class Available_machines:
     def __init__(self,start_date,end_date):
@@ -15,6 +20,7 @@ class Available_machines:
         shifts = 2
         hours = 8
         days = len(pd.date_range(start=start_date, end=end_date))
+        self.hours_per_day = shifts * hours
         self.total_time = shifts * hours * days
         print(self.total_time)
 
@@ -35,24 +41,51 @@ class Available_machines:
         self.total_machine_time_old = dict.fromkeys(self.machine_id, 0)
         self.total_machine_time_new = dict.fromkeys(self.machine_id, 0)
 
+        self.calendar_old = None
+        self.calendar_new = None
+
+    def use_capacity_calendar(self, days, process_hours=None):
+        # machine time from the capacity calendar (C&IT every shift, maintenance after the
+        # operating hours in process_hours, day x machine_id) instead of shifts * hours * days
+        self.calendar_old = CapacityCalendar(days, self.old_machine_quantity)
+        self.calendar_new = CapacityCalendar(days, self.new_machine_quantity)
+        if process_hours is not None:
+            self.calendar_old.schedule_pm(process_hours)
+            self.calendar_new.schedule_pm(process_hours)
+
     def calc_new_values1(self):
+        if self.calendar_new is not None:
+            self.total_machine_time_old = dict(zip(self.machine_id, self.calendar_old.total_hours(self.machine_id).tolist()))
+            self.total_machine_time_new = dict(zip(self.machine_id, self.calendar_new.total_hours(self.machine_id).tolist()))
         for m in self.machine_id:
-            self.total_machine_time_old[m] = self.old_machine_quantity[m]*self.total_time
-            self.total_machine_time_new[m] = self.new_machine_quantity[m]*self.total_time
+            if self.calendar_new is None:
+                self.total_machine_time_old[m] = self.old_machine_quantity[m]*self.total_time
+                self.total_machine_time_new[m] = self.new_machine_quantity[m]*self.total_time
 
             self.OEE_old[m] = self.process_time_old[m]/self.total_machine_time_old[m]
             self.OEE_new[m] = self.process_time_new[m]/self.total_machine_time_new[m]
 
-available_machines = Available_machines(start_date,end_date)
+if __name__ == "__main__":
+    ordered_part = load_ordered_parts()
+
+    days = planning_days(ordered_part)
+    start_date = days[0]
+    end_date = days[-1]
+
+    available_machines = Available_machines(start_date,end_date)
+    available_machines.use_capacity_calendar(days, process_hours_per_day(ordered_part, days, available_machines.machine_id))
+
+    # imported here, yield_model reads the machine information through this module
+    from yield_model import YieldModel
 
-for j in range(len(ordered_part.process_time)):
-    for k, time in enumerate(ordered_part.process_time[j]):
-        machine = ordered_part.route[j][k]
-        n = ordered_part.total_quantity[j]
-        total_time = time * n
+    # process time including the extra pieces for scrap, rework and startup defects
+    index = YieldModel(ordered_part).demand_index(ordered_part)
+    process_time = ordered_part.total_quantity @ index.by_machine(index.process_time_by_machine,
+                                                                  available_machines.machine_id)
+    for machine, total_time in zip(available_machines.machine_id, process_time.tolist()):
         available_machines.process_time_old[machine] += total_time
         available_machines.process_time_new[machine] += total_time
-available_machines.calc_new_values1()
-print(available_machines.OEE_old)
-print(available_machines.OEE_new)
-print(available_machines.new_machine_quantity)
\ No newline at end of file
+    available_machines.calc_new_values1()
+    print(available_machines.OEE_old)
+    print(available_machines.OEE_new)
+    print(available_machines.new_machine_quantity)
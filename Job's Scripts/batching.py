@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from daily_demand import demand_and_count, step_time_matrices
+from simulation import HOURS_PER_SHIFT, SHIFTS
+
+# longest campaign in days, the orders have two to four weeks between order and delivery
+MAX_CYCLE_DAYS = 5
+# changeover_share below is the share of its own setup a part still needs when it follows another
+# part of the same route, 1 is a full setup per part (the old planning), 0 is one setup per
+# campaign; the data has no changeover times, so it is an assumption the caller has to make
+
+
+def campaign_cycle_days(ordered_part, quantity, active, max_cycle_days=MAX_CYCLE_DAYS):
+    # per route the number of days one campaign covers: long enough that every part of the route
+    # fills at least one transport batch per campaign, capped at max_cycle_days
+    route_number = np.asarray(ordered_part.route_number)
+    n_routes = ordered_part.demand_index.n_routes
+    active_days = active.sum(axis=0)
+    daily_quantity = np.divide(quantity.sum(axis=0), active_days, out=np.zeros(len(active_days)),
+                               where=active_days > 0)
+    batch = np.asarray(ordered_part.max_transport_batch, dtype=np.float64)
+    part_cycle = np.ceil(np.divide(batch, daily_quantity, out=np.ones(len(batch)), where=daily_quantity > 0))
+    cycle = np.ones(n_routes, dtype=np.int64)
+    np.maximum.at(cycle, route_number, np.minimum(part_cycle, max_cycle_days).astype(np.int64))
+    return cycle
+
+
+def campaign_setup_time(ordered_part, days, changeover_share, cycle_days=None, quantity=None, active=None):
+    # (day, route, step) setup hours when the parts of a route run as one campaign per cycle:
+    # the largest setup of the parts in the campaign once, plus changeover_share of the others,
+    # booked on the first day of the campaign
+    index = ordered_part.demand_index
+    if quantity is None or active is None:
+        quantity, count = demand_and_count(ordered_part, days)
+        active = count > 0
+    if cycle_days is None:
+        cycle_days = campaign_cycle_days(ordered_part, quantity, active)
+    cycle_days = np.broadcast_to(cycle_days, (index.n_routes,))
+
+    setup = np.zeros((len(days), index.n_routes, index.n_steps))
+    for r in range(index.n_routes):
+        parts = ordered_part.route_catalog.parts(r)
+        if len(parts) == 0:
+            continue
+        step_setup = index.setup_time[parts][:, r * index.n_steps:(r + 1) * index.n_steps]
+        starts = np.arange(0, len(days), cycle_days[r])
+        in_campaign = np.add.reduceat(active[:, parts], starts, axis=0) > 0
+        total = in_campaign @ step_setup
+        largest = (in_campaign[:, :, None] * step_setup[None]).max(axis=1)
+        setup[starts, r] = largest + changeover_share * (total - largest)
+    return setup
+
+
+def batched_route_time(ordered_part, days, changeover_share, machine_quantity=None, cycle_days=None):
+    # route_time with the campaign setups instead of one setup per part per day
+    quantity, count = demand_and_count(ordered_part, days)
+    time_per_piece, _, shape = step_time_matrices(ordered_part, machine_quantity)
+    hours = (quantity @ time_per_piece).reshape(len(days), *shape)
+    return hours + campaign_setup_time(ordered_part, days, changeover_share, cycle_days, quantity, count > 0)
+
+
+def lot_sizes(ordered_part, days, cycle_days=None):
+    # per part the pieces one campaign makes and the transport batches that takes
+    quantity, count = demand_and_count(ordered_part, days)
+    active = count > 0
+    if cycle_days is None:
+        cycle_days = campaign_cycle_days(ordered_part, quantity, active)
+    route_number = np.asarray(ordered_part.route_number)
+    active_days = active.sum(axis=0)
+    daily_quantity = np.divide(quantity.sum(axis=0), active_days, out=np.zeros(len(active_days)),
+                               where=active_days > 0)
+    lot = daily_quantity * np.broadcast_to(cycle_days, (ordered_part.demand_index.n_routes,))[route_number]
+    batch = np.asarray(ordered_part.max_transport_batch, dtype=np.float64)
+    return pd.DataFrame({
+        "part_id": ordered_part.part_id,
+        "route_number": route_number,
+        "cycle_days": np.broadcast_to(cycle_days, (ordered_part.demand_index.n_routes,))[route_number],
+        "lot_size": lot,
+        "max_transport_batch": batch,
+        "transport_batches": np.ceil(lot / batch),
+    })
+
+
+def setup_savings(ordered_part, days, machine_types, changeover_share, cycle_days=None):
+    # per machine type the setup hours of the daily planning against the campaigns, and the
+    # machine days per shift pattern that the difference frees up; the assumed changeover_share
+    # goes along as a column, the savings only hold for it
+    index = ordered_part.demand_index
+    quantity, count = demand_and_count(ordered_part, days)
+    active = count > 0
+    daily = (active @ index.setup_time).sum(axis=0)
+    batched = campaign_setup_time(ordered_part, days, changeover_share, cycle_days, quantity,
+                                  active).sum(axis=0).reshape(-1)
+
+    step_machine = index.step_to_machine()
+    columns = index.machine_columns(machine_types)
+    daily_by_machine = np.zeros(len(machine_types))
+    batched_by_machine = np.zeros(len(machine_types))
+    used = columns >= 0
+    daily_by_machine[used] = (daily @ step_machine)[columns[used]]
+    batched_by_machine[used] = (batched @ step_machine)[columns[used]]
+
+    savings = pd.DataFrame({
+        "setup_hours_daily": daily_by_machine,
+        "setup_hours_campaign": batched_by_machine,
+    }, index=pd.Index(machine_types, name="machine_type"))
+    savings["saved_hours"] = savings["setup_hours_daily"] - savings["setup_hours_campaign"]
+    savings["saved_share"] = savings["saved_hours"] / savings["setup_hours_daily"].where(savings["setup_hours_daily"] > 0)
+    savings["saved_machine_days"] = savings["saved_hours"] / (SHIFTS * HOURS_PER_SHIFT)
+    savings["assumed_changeover_share"] = changeover_share
+    return savings
+
+
+if __name__ == "__main__":
+    from make_json_ordered_parts import load_ordered_parts
+    from daily_demand import planning_days
+
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    machine_types = ["SM", "TM", "MM", "MC", "DM", "GM", "CMM", "A"]
+
+    print(lot_sizes(ordered_part, days).to_string(index=False))
+    # no changeover times in the data, so the savings for a range of assumed shares
+    for changeover_share in [0.0, 0.25, 0.5, 1.0]:
+        print(f"assuming a part after another of its route needs {changeover_share:.0%} of its setup:")
+        print(setup_savings(ordered_part, days, machine_types, changeover_share).to_string())
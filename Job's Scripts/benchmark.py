@@ -0,0 +1,111 @@
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+
+from make_json_ordered_parts import build_ordered_part
+from bom import BomGraph
+from daily_demand import planning_days
+from get_daily_data import make_planning, route_load_jobs
+from render import render_all
+from OEE import Available_machines
+from synthetic_factory import write_factory
+
+RESULTS_PATH = "../benchmarks/results.csv"
+# a stage counts as a regression when it is this much slower than the best earlier run
+REGRESSION_FACTOR = 1.25
+
+SIZES = [
+    dict(n_products=40, bom_depth=2, route_length=(3, 8), n_orders=200),
+    dict(n_products=400, bom_depth=3, route_length=(3, 8), n_orders=2000),
+    dict(n_products=2000, bom_depth=3, route_length=(4, 10), n_orders=20000, horizon_days=730),
+]
+
+
+def time_stage(function, repeat):
+    # best of repeat runs, the result of the last run is passed on to the next stage
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_pipeline(portfolio_path, orders_path, repeat=3, plot_routes=3):
+    timings = {}
+    timings["load"], ordered_part = time_stage(
+        lambda: build_ordered_part(portfolio_path, orders_path).compact(), repeat)
+    own_quantity = np.array([sum(quantity) for quantity in ordered_part.orders.quantity])
+    timings["bom_explosion"], _ = time_stage(
+        lambda: BomGraph.from_ordered_part(ordered_part).explode(own_quantity), repeat)
+
+    days = planning_days(ordered_part)
+    timings["daily_planning"], planning = time_stage(lambda: make_planning(ordered_part, None), repeat)
+
+    def oee():
+        available_machines = Available_machines(days[0], days[-1])
+        index = ordered_part.demand_index
+        process_time = ordered_part.total_quantity @ index.by_machine(index.process_time_by_machine,
+                                                                      available_machines.machine_id)
+        return process_time / (np.array(list(available_machines.new_machine_quantity.values()))
+                               * available_machines.total_time)
+    timings["oee"], _ = time_stage(oee, repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the whole route chart job of the report, series plus headless rendering in the pool
+        timings["plotting"], _ = time_stage(
+            lambda: render_all(route_load_jobs(planning, directory)[:plot_routes], force=True), 1)
+    return timings
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(sizes=SIZES, results_path=RESULTS_PATH, repeat=3):
+    rows = []
+    run_at = datetime.now().isoformat(timespec="seconds")
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            portfolio_path, orders_path = write_factory(directory, **size)
+            n_parts = pd.read_csv(portfolio_path)["Part number"].notna().sum()
+            for stage, seconds in run_pipeline(portfolio_path, orders_path, repeat).items():
+                rows.append({"run_at": run_at, "commit": commit, "stage": stage, "n_parts": n_parts,
+                             "size": str(size), "seconds": seconds})
+    results = pd.DataFrame(rows)
+
+    if os.path.exists(results_path):
+        history = pd.read_csv(results_path)
+        best = history.groupby(["size", "stage"])["seconds"].min().rename("best_seconds")
+        results = results.join(best, on=["size", "stage"])
+        results["ratio"] = results["seconds"] / results["best_seconds"]
+        results["regression"] = results["ratio"] > REGRESSION_FACTOR
+        results = results.drop(columns=["best_seconds"])
+    else:
+        results["ratio"] = np.nan
+        results["regression"] = False
+
+    os.makedirs(os.path.dirname(results_path), exist_ok=True)
+    stored = results.drop(columns=["ratio", "regression"])
+    stored.to_csv(results_path, mode="a", header=not os.path.exists(results_path), index=False)
+    return results
+
+
+if __name__ == "__main__":
+    results = run_benchmarks()
+    print(results[["n_parts", "stage", "seconds", "ratio", "regression"]].to_string(index=False))
+    if results["regression"].any():
+        print("slower than the best earlier run:")
+        print(results[results["regression"]][["size", "stage", "ratio"]].to_string(index=False))
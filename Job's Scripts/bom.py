@@ -0,0 +1,126 @@
+import numpy as np
+
+
+class BomCycleError(ValueError):
+    pass
+
+
+class BomGraph:
+    # the sub-part lists of the portfolio as a DAG: one edge per (parent, sub-part) entry with the
+    # number of sub-parts per parent, parts in topological order (every parent before its sub-parts)
+    def __init__(self, part_id, sub_part_id, quantity_of_sub_part):
+        self.part_id = list(part_id)
+        self.part_index = {}
+        for i, p_id in enumerate(self.part_id):
+            self.part_index.setdefault(p_id, i)
+
+        parent, child, quantity = [], [], []
+        for i, (sub_parts, quantities) in enumerate(zip(sub_part_id, quantity_of_sub_part)):
+            for j, sub_part in enumerate(sub_parts):
+                if sub_part == 'Purch. items':
+                    continue
+                parent.append(i)
+                child.append(self.part_index[sub_part])
+                quantity.append(quantities[j])
+        self.parent = np.array(parent, dtype=np.int64)
+        self.child = np.array(child, dtype=np.int64)
+        self.quantity = np.array(quantity, dtype=np.float64)
+
+        n_parts = len(self.part_id)
+        # sub-parts per part as CSR, in the order of the portfolio
+        edge_order = np.argsort(self.parent, kind="stable")
+        self.child_offsets = np.zeros(n_parts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.parent, minlength=n_parts), out=self.child_offsets[1:])
+        self.children = self.child[edge_order]
+        self.child_quantity = self.quantity[edge_order]
+
+        self.order, self.depth = self._topological_order()
+        # an edge can be applied once every edge into its parent is, which is the case per depth level;
+        # edges sorted by level so level l is level_edges[level_offsets[l]:level_offsets[l + 1]]
+        self.n_levels = int(self.depth.max()) + 1 if n_parts else 0
+        edge_level = self.depth[self.parent]
+        self.level_edges = np.argsort(edge_level, kind="stable")
+        self.level_offsets = np.zeros(self.n_levels + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_level, minlength=self.n_levels), out=self.level_offsets[1:])
+
+        self._multipliers = [None] * n_parts
+        self._path_counts = [None] * n_parts
+
+    @classmethod
+    def from_ordered_part(cls, ordered_part):
+        return cls(ordered_part.part_id, ordered_part.sub_part_id, ordered_part.quantity_of_sub_part)
+
+    def sub_parts(self, i):
+        start, end = self.child_offsets[i], self.child_offsets[i + 1]
+        return self.children[start:end], self.child_quantity[start:end]
+
+    def _topological_order(self):
+        # Kahn's algorithm, the depth of a part is the longest chain of parents above it
+        n_parts = len(self.part_id)
+        n_parents = np.bincount(self.child, minlength=n_parts)
+        depth = np.zeros(n_parts, dtype=np.int64)
+        ready = list(np.flatnonzero(n_parents == 0)[::-1])
+        order = []
+        while ready:
+            i = ready.pop()
+            order.append(i)
+            children, _ = self.sub_parts(i)
+            for c in children:
+                depth[c] = max(depth[c], depth[i] + 1)
+                n_parents[c] -= 1
+                if n_parents[c] == 0:
+                    ready.append(c)
+        if len(order) < n_parts:
+            raise BomCycleError("sub-part lists contain a cycle: " + " -> ".join(self._find_cycle(n_parents > 0)))
+        return np.array(order, dtype=np.int64), depth
+
+    def _find_cycle(self, left):
+        # every part left after Kahn's algorithm has a parent that is left as well,
+        # so walking up the parents from any of them ends in a cycle
+        parents_left = {}
+        for p, c in zip(self.parent, self.child):
+            if left[p] and left[c]:
+                parents_left.setdefault(c, p)
+        i = int(np.flatnonzero(left)[0])
+        seen = []
+        while i not in seen:
+            seen.append(i)
+            i = parents_left[i]
+        cycle = seen[seen.index(i):][::-1]
+        return [self.part_id[j] for j in cycle + [cycle[0]]]
+
+    def explode(self, quantity, weighted=True):
+        # passes quantities down every path of the BOM, the last axis is the part axis so a
+        # (day, part) demand works as well as a per part total; with weighted=False a sub-part
+        # gets the quantity of its parent once per path, like the inherited orders in the planning
+        total = np.moveaxis(np.array(quantity, dtype=np.float64), -1, 0).copy()
+        for level in range(self.n_levels - 1):
+            edges = self.level_edges[self.level_offsets[level]:self.level_offsets[level + 1]]
+            passed_down = total[self.parent[edges]]
+            if weighted:
+                passed_down = passed_down * self.quantity[edges].reshape((-1,) + (1,) * (total.ndim - 1))
+            np.add.at(total, self.child[edges], passed_down)
+        return np.moveaxis(total, 0, -1)
+
+    def multipliers(self, i):
+        # {component: pieces per piece of part i} over every level below i, i itself included
+        if self._multipliers[i] is None:
+            self._fill(self._multipliers, True)
+        return self._multipliers[i]
+
+    def path_counts(self, i):
+        # {component: number of paths from part i}, i itself included
+        if self._path_counts[i] is None:
+            self._fill(self._path_counts, False)
+        return self._path_counts[i]
+
+    def _fill(self, memo, weighted):
+        # children before parents, so every part only merges the finished dicts of its sub-parts
+        for i in self.order[::-1]:
+            totals = {int(i): 1}
+            children, quantities = self.sub_parts(i)
+            for c, q in zip(children, quantities):
+                factor = float(q) if weighted else 1
+                for part, n in memo[c].items():
+                    totals[part] = totals.get(part, 0) + factor * n
+            memo[i] = totals
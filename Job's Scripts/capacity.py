@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from daily_demand import demand_matrix
+from simulation import HOURS_PER_SHIFT, SHIFTS, read_maintenance, read_pm_intervals
+
+
+class CapacityCalendar:
+    # available hours per machine instance, per day, per shift: the shift minus cleaning and
+    # inspection, minus preventive maintenance once schedule_pm has placed it
+    def __init__(self, days, machine_quantity, maintenance=None, pm_intervals=None, operating_hours=None):
+        self.days = np.asarray(days, dtype="datetime64[D]")
+        self.machine_id = list(machine_quantity)
+        self.machine_count = np.array([int(n) for n in machine_quantity.values()], dtype=np.int64)
+        # machine type of every instance, instances of one type are next to each other
+        self.instance_type = np.repeat(np.arange(len(self.machine_id)), self.machine_count)
+
+        maintenance = read_maintenance() if maintenance is None else maintenance
+        self.minor_pm_after, self.major_pm_after = read_pm_intervals() if pm_intervals is None else pm_intervals
+        per_type = maintenance.reindex(self.machine_id)
+        self.cit_per_shift = per_type["cit_per_shift"].fillna(0).to_numpy()
+        # (minor, major) maintenance hours per type, NaN for types without maintenance (assembly)
+        self.pm_time = per_type[["minor_pm_time", "major_pm_time"]].to_numpy()
+
+        shift_hours = HOURS_PER_SHIFT - self.cit_per_shift[self.instance_type]
+        self.available = np.repeat(shift_hours[:, None, None], len(self.days) * SHIFTS, axis=1)
+        self.available = self.available.reshape(len(self.instance_type), len(self.days), SHIFTS)
+        self.pm_hours = np.zeros_like(self.available)
+        self.operating_hours = (np.zeros(len(self.instance_type)) if operating_hours is None
+                                else np.asarray(operating_hours, dtype=np.float64).copy())
+
+    def schedule_pm(self, process_hours):
+        # process_hours is (day, machine_id) operating hours, spread evenly over the instances of a
+        # type and the shifts of a day; a machine gets maintenance in the shift after it passes
+        # every minor_pm_after operating hours, the major one when it also passes major_pm_after
+        process_hours = np.asarray(process_hours, dtype=np.float64)
+        per_instance = process_hours[:, self.instance_type] / self.machine_count[self.instance_type]
+        per_shift = np.repeat(per_instance.T / SHIFTS, SHIFTS, axis=1)
+        before = self.operating_hours[:, None] + np.cumsum(per_shift, axis=1) - per_shift
+        after = before + per_shift
+
+        minor = np.floor(after / self.minor_pm_after) > np.floor(before / self.minor_pm_after)
+        major = np.floor(after / self.major_pm_after) > np.floor(before / self.major_pm_after)
+        minor &= ~np.isnan(self.pm_time[self.instance_type, 0])[:, None]
+
+        available = self.available.reshape(len(self.instance_type), -1)
+        pm_hours = self.pm_hours.reshape(len(self.instance_type), -1)
+        for instance, slot in zip(*np.nonzero(minor)):
+            hours = self.pm_time[self.instance_type[instance], int(major[instance, slot])]
+            # a maintenance longer than what is left of a shift goes on in the next shifts
+            slot += 1
+            while hours > 0 and slot < available.shape[1]:
+                taken = min(hours, available[instance, slot])
+                available[instance, slot] -= taken
+                pm_hours[instance, slot] += taken
+                hours -= taken
+                slot += 1
+        self.operating_hours = after[:, -1] if after.shape[1] else self.operating_hours
+        return self
+
+    def _by_type(self, values):
+        # (day, machine_id) sum over the instances and shifts of every type
+        result = np.zeros((len(self.machine_id), len(self.days)))
+        np.add.at(result, self.instance_type, values.sum(axis=2))
+        return result.T
+
+    def hours_by_machine_type(self, machine_types=None):
+        # (day, machine type) available hours of all machines of a type together
+        hours = self._by_type(self.available)
+        return hours if machine_types is None else hours[:, self.columns(machine_types)]
+
+    def hours_per_machine(self, machine_types=None):
+        # (day, machine type) available hours of one machine on average
+        hours = self._by_type(self.available) / np.maximum(self.machine_count, 1)
+        return hours if machine_types is None else hours[:, self.columns(machine_types)]
+
+    def total_hours(self, machine_types=None):
+        return self.hours_by_machine_type(machine_types).sum(axis=0)
+
+    def pm_hours_by_machine_type(self, machine_types=None):
+        hours = self._by_type(self.pm_hours)
+        return hours if machine_types is None else hours[:, self.columns(machine_types)]
+
+    def columns(self, machine_types):
+        return np.array([self.machine_id.index(m) for m in machine_types])
+
+    def day_index(self, dates):
+        return np.searchsorted(self.days, np.asarray(dates, dtype="datetime64[D]"))
+
+    def lookup(self, dates, machine_types, per_machine=True):
+        # available hours for every (date, machine type) pair, both given as arrays of equal length
+        hours = self.hours_per_machine() if per_machine else self.hours_by_machine_type()
+        return hours[self.day_index(dates), self.columns(machine_types)]
+
+    def to_frame(self):
+        # one row per machine instance, day and shift
+        instance, day, shift = np.indices(self.available.shape).reshape(3, -1)
+        number = instance - np.repeat(np.cumsum(self.machine_count) - self.machine_count, self.machine_count)[instance]
+        return pd.DataFrame({
+            "machine_type": np.asarray(self.machine_id)[self.instance_type[instance]],
+            "machine": number,
+            "date": self.days[day],
+            "shift": shift + 1,
+            "available_hours": self.available.reshape(-1),
+            "pm_hours": self.pm_hours.reshape(-1),
+        })
+
+
+def process_hours_per_day(ordered_part, days, machine_types):
+    # (day, machine type) process time of the daily planning, the operating hours maintenance counts
+    index = ordered_part.demand_index
+    quantity, _ = demand_matrix(ordered_part, days)
+    return quantity @ index.by_machine(index.process_time_by_machine, machine_types)
+
+
+if __name__ == "__main__":
+    from make_json_ordered_parts import load_ordered_parts
+    from daily_demand import planning_days
+    from OEE import Available_machines
+
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    available_machines = Available_machines(days[0], days[-1])
+
+    calendar = CapacityCalendar(days, available_machines.new_machine_quantity)
+    calendar.schedule_pm(process_hours_per_day(ordered_part, days, calendar.machine_id))
+    print(pd.DataFrame({
+        "flat hours": calendar.machine_count * available_machines.total_time,
+        "calendar hours": calendar.total_hours(),
+        "maintenance hours": calendar.pm_hours_by_machine_type().sum(axis=0),
+    }, index=calendar.machine_id))
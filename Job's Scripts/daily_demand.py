@@ -0,0 +1,216 @@
+import numpy as np
+
+from bom import BomGraph
+
+
+def planning_days(ordered_part):
+    # every calendar day from the first order date up to the last delivery date
+    table = ordered_part.orders.table
+    return np.arange(table.order_date.min(), table.delivery_date.max() + 1)
+
+
+def active_day_range(days, order_date, delivery_date):
+    # an order is worked on from the day after its order date up to and including its delivery date
+    first_day = np.searchsorted(days, order_date + 1, side="left")
+    end_day = np.searchsorted(days, delivery_date, side="right")
+    return first_day, end_day
+
+
+def demand_and_count(ordered_part, days):
+    # sweep line over all orders at once: +parts_per_day on the first active day,
+    # -parts_per_day on the first day after delivery, then a cumulative sum over the days
+    table = ordered_part.orders.table
+    n_days, n_parts = len(days), len(ordered_part.part_id)
+    first_day, end_day = active_day_range(days, table.order_date, table.delivery_date)
+
+    cells = (n_days + 1) * n_parts
+    start_index = first_day * n_parts + table.part
+    end_index = end_day * n_parts + table.part
+
+    quantity = np.bincount(start_index, weights=table.parts_per_day, minlength=cells)
+    quantity -= np.bincount(end_index, weights=table.parts_per_day, minlength=cells)
+    count = np.bincount(start_index, minlength=cells) - np.bincount(end_index, minlength=cells)
+
+    quantity = np.cumsum(quantity.reshape(n_days + 1, n_parts)[:-1], axis=0)
+    count = np.cumsum(count.reshape(n_days + 1, n_parts)[:-1], axis=0)
+    # the running sum leaves rounding noise behind once every order of a part is done
+    quantity[count == 0] = 0
+    return quantity, count
+
+
+def demand_matrix(ordered_part, days):
+    # day x part parts per day and whether the part has any open order that day
+    quantity, count = demand_and_count(ordered_part, days)
+    return quantity, count > 0
+
+
+def step_time_matrices(ordered_part, machine_quantity=None, demand_index=None):
+    # part x (route, step) matrices with the time per piece and the setup time,
+    # so the load of every step is a single matrix product with the demand
+    index = ordered_part.demand_index if demand_index is None else demand_index
+    time_per_piece = index.piece_time
+    if machine_quantity is not None:
+        # a step without a share of a machine has no pieces either, see allocate_machines
+        shares = index.step_shares(machine_quantity)
+        time_per_piece = np.divide(time_per_piece, shares, out=np.zeros_like(time_per_piece), where=shares > 0)
+    return time_per_piece, index.setup_time, (index.n_routes, index.n_steps)
+
+
+def route_time(ordered_part, days, machine_quantity=None, demand_index=None, demand=None):
+    # (day, route, step) hours, setup is added once per active part per day; demand is a
+    # (quantity, active) pair like demand_matrix returns, e.g. leveling.LoadLeveler.demand()
+    quantity, active = demand_matrix(ordered_part, days) if demand is None else demand
+    time_per_piece, setup_time, shape = step_time_matrices(ordered_part, machine_quantity, demand_index)
+    hours = quantity @ time_per_piece + active @ setup_time
+    return hours.reshape(len(days), *shape)
+
+
+def step_loads(ordered_part, days, balance="load", demand_index=None, demand=None):
+    # hours per (route, step) column that allocate_machines splits the machines by: all hours over
+    # the days ("load") or the hours of the busiest day ("peak")
+    hours = route_time(ordered_part, days, None, demand_index, demand).reshape(len(days), -1)
+    if balance == "load":
+        return hours.sum(axis=0)
+    if balance == "peak":
+        return hours.max(axis=0, initial=0)
+    raise ValueError(f"unknown balance {balance!r}, use 'load' or 'peak'")
+
+
+def allocate_machines(ordered_part, machine_quantity, days=None, balance="load", demand_index=None, demand=None,
+                      loads=None):
+    # per route the machine share of every step, the table step_shares and make_planning take: the
+    # machines of a type are split over the steps on that type in proportion to their step_loads,
+    # with "peak" every step of a type then reaches the same peak utilization; loads can be passed
+    # in so a scenario with other machine counts is only this split
+    index = ordered_part.demand_index if demand_index is None else demand_index
+    if loads is None:
+        days = planning_days(ordered_part) if days is None else days
+        loads = step_loads(ordered_part, days, balance, index, demand)
+    missing = [m for m in index.machine_id if m not in machine_quantity]
+    if missing:
+        raise ValueError(f"no machine count for {missing}")
+    count = np.array([machine_quantity[m] for m in index.machine_id], dtype=np.float64)
+
+    used = index.step_machine >= 0
+    machine = np.maximum(index.step_machine, 0)
+    type_load = np.bincount(machine[used], weights=loads[used], minlength=len(count))
+    shares = np.divide(count[machine] * loads, type_load[machine], out=np.zeros(len(loads)),
+                       where=used & (type_load[machine] > 0))
+    shares = shares.reshape(index.n_routes, index.n_steps)
+    lengths = used.reshape(index.n_routes, index.n_steps).sum(axis=1)
+    return [shares[r, :lengths[r]].tolist() for r in range(index.n_routes)]
+
+
+def inheriting_parts(ordered_part, bom=None):
+    # for every part the parts that get its orders passed down (itself included),
+    # counted once per path through the sub-part lists like assign_sub_part_data_to_class does
+    bom = BomGraph.from_ordered_part(ordered_part) if bom is None else bom
+    return [bom.path_counts(i) for i in range(len(ordered_part.part_id))]
+
+
+class IncrementalPlanning:
+    # keeps the demand matrix and (day, route, step) hours alive and patches them per order,
+    # only the days the order is open and the part plus its sub-parts are recomputed
+    def __init__(self, ordered_part, days=None, machine_quantity=None):
+        self.ordered_part = ordered_part
+        self.days = planning_days(ordered_part) if days is None else days
+        self.part_index = {}
+        for i, part_id in enumerate(ordered_part.part_id):
+            self.part_index.setdefault(part_id, i)
+        self.inheriting = inheriting_parts(ordered_part)
+
+        self.time_per_piece, self.setup_time, self.shape = step_time_matrices(ordered_part, machine_quantity)
+        self.quantity, self.count = demand_and_count(ordered_part, self.days)
+        self.hours = self.quantity @ self.time_per_piece + (self.count > 0) @ self.setup_time
+
+        # orders as they were placed, the inherited rows follow from the part
+        table = ordered_part.orders.table
+        own = table.part == table.source_part
+        self.orders = {
+            int(n): (int(p), od, dd, float(q))
+            for n, p, od, dd, q in zip(table.order_number[own], table.part[own], table.order_date[own],
+                                       table.delivery_date[own], table.parts_per_day[own])
+        }
+
+    @property
+    def route_time(self):
+        return self.hours.reshape(len(self.days), *self.shape)
+
+    def _extend_days(self, first_date, last_date):
+        before = max(int((self.days[0] - first_date).astype(int)), 0)
+        after = max(int((last_date - self.days[-1]).astype(int)), 0)
+        if before == 0 and after == 0:
+            return
+        self.days = np.arange(self.days[0] - before, self.days[-1] + after + 1)
+        pad = ((before, after), (0, 0))
+        self.quantity = np.pad(self.quantity, pad)
+        self.count = np.pad(self.count, pad)
+        self.hours = np.pad(self.hours, pad)
+
+    def _apply(self, part, order_date, delivery_date, parts_per_day, sign):
+        self._extend_days(order_date + 1, delivery_date)
+        first_day, end_day = active_day_range(self.days, order_date, delivery_date)
+        if first_day >= end_day:
+            return
+        parts = np.array(list(self.inheriting[part].keys()))
+        paths = np.array(list(self.inheriting[part].values()))
+        block = np.s_[first_day:end_day]
+        time_per_piece = self.time_per_piece[parts]
+        setup_time = self.setup_time[parts]
+
+        quantity = self.quantity[block][:, parts]
+        count = self.count[block][:, parts]
+        self.hours[block] -= quantity @ time_per_piece + (count > 0) @ setup_time
+
+        count += sign * paths
+        quantity += sign * parts_per_day * paths
+        quantity[count == 0] = 0
+        self.quantity[block, parts] = quantity
+        self.count[block, parts] = count
+        self.hours[block] += quantity @ time_per_piece + (count > 0) @ setup_time
+
+    def _new_entry(self, order_number, part_id, quantity, order_date, delivery_date):
+        # the (part, order date, delivery date, parts per day) entry of an order, checked first
+        if part_id not in self.part_index:
+            raise ValueError(f"order {order_number} is for unknown part {part_id!r}")
+        order_date = np.datetime64(order_date, "D")
+        delivery_date = np.datetime64(delivery_date, "D")
+        days_to_produce = int((delivery_date - order_date).astype(int))
+        if days_to_produce <= 0:
+            raise ValueError(f"order {order_number} has to be delivered after its order date")
+        return self.part_index[part_id], order_date, delivery_date, quantity / days_to_produce
+
+    def add_order(self, order_number, part_id, quantity, order_date, delivery_date):
+        if order_number in self.orders:
+            raise ValueError(f"order {order_number} is already planned")
+        entry = self._new_entry(order_number, part_id, quantity, order_date, delivery_date)
+        self._apply(*entry, 1)
+        self.orders[order_number] = entry
+
+    def remove_order(self, order_number):
+        part, order_date, delivery_date, parts_per_day = self.orders.pop(order_number)
+        self._apply(part, order_date, delivery_date, parts_per_day, -1)
+
+    def update_order(self, order_number, part_id=None, quantity=None, order_date=None, delivery_date=None):
+        # the new values are checked before the old order is taken out, so a bad update leaves
+        # the planning as it was
+        part, old_order_date, old_delivery_date, parts_per_day = self.orders[order_number]
+        old_days = int((old_delivery_date - old_order_date).astype(int))
+        entry = self._new_entry(
+            order_number,
+            self.ordered_part.part_id[part] if part_id is None else part_id,
+            parts_per_day * old_days if quantity is None else quantity,
+            old_order_date if order_date is None else order_date,
+            old_delivery_date if delivery_date is None else delivery_date,
+        )
+        self.remove_order(order_number)
+        self._apply(*entry, 1)
+        self.orders[order_number] = entry
+
+
+def machine_type_load(ordered_part, days, machine_types, demand_index=None):
+    # (day, machine type) hours, the same product as route_time against the machine type matrices
+    index = ordered_part.demand_index if demand_index is None else demand_index
+    quantity, active = demand_matrix(ordered_part, days)
+    return (quantity @ index.by_machine(index.piece_time_by_machine, machine_types)
+            + active @ index.by_machine(index.setup_time_by_machine, machine_types))
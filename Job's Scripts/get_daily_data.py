@@ -1,26 +1,12 @@
-from matplotlib.style.core import available
-
-from make_json_ordered_parts import ordered_part
-import pandas as pd
-import matplotlib.pyplot as plt
+from make_json_ordered_parts import load_ordered_parts
+from daily_demand import allocate_machines, planning_days, demand_matrix, route_time
+from capacity import CapacityCalendar, process_hours_per_day
+from OEE import Available_machines
+from yield_model import YieldModel
+from render import draw_route_load, render_all, route_load_series
+import os
 import numpy as np
 
-def flatten(x):
-    if isinstance(x, list):
-        result = []
-        for item in x:
-            result.extend(flatten(item))
-        return result
-    else:
-        return [x]
-df = pd.read_csv("../data/Order pattern.csv")
-
-df["Order date"] = pd.to_datetime(df["Order date"])
-df["Desired delivery date"] = pd.to_datetime(df["Desired delivery date"])
-
-start_date = df["Order date"].min()
-end_date = df["Desired delivery date"].max()
-
 class Planning:
     def __init__(self):
         self.day = []
@@ -31,118 +17,59 @@ class Planning:
         self.route = []
         self.route_time = []
         self.machine_quantity = []
-
-
-planning = Planning()
-
-planning.machine_quantity = [
-    [2,2,3,2,1,2], # route 0 / SM,TM,MM,GM,CMM,A
-    [2,0.75,0.5,1.1], # route 1 / MC,GM,CMM,A
-    [1,2,1.5,0.9], # route 2 / SM,MM,DM,CMM
-    [1,2,1,0.75,1], # route 3 / SM,MC,GM,CMM,A
-    [0.6,0.3,0.3,0.5,0.5,0.6,0.25,0.5], # route 4 / SM,TM,MM,TM,GM,DM,CMM,A
-    [0.4,0.1,0.2,0.5,0.2,0.2,0.2], # route 5 / TM,CMM,TM,GM,CMM,MM,CMM
-    [0.4], # route 6 / A
-    [0.1,0.2,0.1,0.25,0.1], # route 7 / SM,TM,MM,GM,CMM
-    [0.1,0.1,0.1], # route 8 / SM,TM,MM
-    [0.2,0.4,0.4] # route 9 / SM,MM,DM
-    ]
-
-flat_order_dates = []
-flat_delivery_dates = []
-flat_part_ids = []
-flat_quantities = []
-
-for i, part_id in enumerate(ordered_part.part_id):
-    order_dates = flatten(ordered_part.orders.order_date[i])
-    delivery_dates = flatten(ordered_part.orders.delivery_date[i])
-    quantities = flatten(ordered_part.orders.parts_per_day[i])
-
-    for od, dd, q in zip(order_dates, delivery_dates, quantities):
-        flat_part_ids.append(part_id)
-        flat_order_dates.append(od)
-        flat_delivery_dates.append(dd)
-        flat_quantities.append(q)
-
-df_clean = pd.DataFrame({
-    "part_id": flat_part_ids,
-    "order_date": pd.to_datetime(flat_order_dates),
-    "delivery_date": pd.to_datetime(flat_delivery_dates),
-    "quantity": flat_quantities
-})
-part_index_map = {p: i for i, p in enumerate(ordered_part.part_id)}
-seen = set()
-unique_route_numbers = []
-part_routes = []
-for i, rn in enumerate(ordered_part.route_number):
-    if rn not in seen:
-        seen.add(rn)
-        unique_route_numbers.append(rn)
-        part_routes.append(ordered_part.route[i])
-
-for i, day in enumerate(pd.date_range(start=start_date, end=end_date)):
-    active = df_clean[
-        (df_clean["order_date"] < day) & (df_clean["delivery_date"] >= day)
-    ]
-
-    grouped = active.groupby("part_id")["quantity"].sum()
-    planning.day.append(day.date())
-    planning.part_numbers.append(grouped.index.tolist())
-    planning.part_quantities.append(grouped.values.tolist())
-
-    planning.route_time.append([])
-
-    for j, route in enumerate(part_routes):
-        planning.route_time[i].append([0] * len(route))
-
-    for p, part_number in enumerate(planning.part_numbers[i]):
-        idx = part_index_map[part_number]
-        route_number = ordered_part.route_number[idx]
-
-        # add setup time ONCE
-        for l in range(len(ordered_part.setup_time[idx])):
-            #mq = planning.machine_quantity[route_number][l]
-            planning.route_time[i][route_number][l] += ordered_part.setup_time[idx][l]#/mq
-
-        # add production time
-        for j in range(len(ordered_part.avg_idle_time[idx])):
-            mq = planning.machine_quantity[route_number][j]
-            machine_time = (
-                    (ordered_part.avg_idle_time[idx][j] + ordered_part.process_time[idx][j])
-                    * planning.part_quantities[i][p] / planning.machine_quantity[route_number][j]
-            )
-            planning.route_time[i][route_number][j] += machine_time
-
-
-for j in unique_route_numbers:
-    plt.figure()
-
-    for k, machine in enumerate(part_routes[j]):
-        y = [
-            planning.route_time[i][j][k]
-            for i in range(len(planning.day))
-        ]
-
-        line, = plt.plot(
-            planning.day,
-            y,
-            label=f"step {k+1}: {machine}({planning.machine_quantity[j][k]}x)"
-        )
-        plt.axhline(
-            np.mean(y),
-            linestyle="--",
-            color=line.get_color(),
-            label="_nolegend_"  # <-- key trick
-        )
-    plt.axhline(16, linestyle="-", color="k", label="hours in a day")
-    plt.xlabel("Day")
-    plt.ylabel("Total machine time per day [h]")
-    plt.title(f"Production line {j}")
-    plt.legend(loc="upper right")
-    plt.ylim(0, 40)
-    plt.xlim(start_date, end_date)
-    plt.xticks(rotation=45)
-    plt.savefig(f"{j}.png")
-
-#plt.show()
-
+        self.capacity = None
+
+
+def make_planning(ordered_part, machine_quantity=None, calendar=None, demand_index=None, demand=None):
+    # machine_quantity is the machine share of every route step, from daily_demand.allocate_machines
+    planning = Planning()
+    planning.machine_quantity = machine_quantity
+
+    days = planning_days(ordered_part)
+    planning.route = [list(route) for route in ordered_part.route_catalog.routes]
+
+    # the orders spread evenly over their days, or a leveled plan from leveling.LoadLeveler
+    quantity, active = demand_matrix(ordered_part, days) if demand is None else demand
+    for i, day in enumerate(days):
+        parts = np.flatnonzero(active[i])
+        planning.day.append(day.astype(object))
+        planning.part_numbers.append([ordered_part.part_id[p] for p in parts])
+        planning.part_quantities.append(quantity[i, parts].tolist())
+
+    # (day, route, step) hours, setup time is added once per active part per day
+    planning.route_time = route_time(ordered_part, days, planning.machine_quantity, demand_index,
+                                     (quantity, active))
+
+    if calendar is not None:
+        # (day, route, step) hours one machine of the step's type has, from capacity.CapacityCalendar
+        index = ordered_part.demand_index
+        per_machine = calendar.hours_per_machine(index.machine_id)
+        step_hours = per_machine[np.searchsorted(calendar.days, days)][:, np.maximum(index.step_machine, 0)]
+        planning.capacity = step_hours.reshape(len(days), index.n_routes, index.n_steps)
+    return planning
+
+
+def plot_route_load(planning, j, path=None):
+    draw_route_load(route_load_series(planning, j), f"{j}.png" if path is None else path)
+
+
+def route_load_jobs(planning, directory="."):
+    # one render.render_all job per route
+    return [("route_load", route_load_series(planning, j), os.path.join(directory, f"{j}.png"))
+            for j in range(len(planning.route))]
+
+
+if __name__ == "__main__":
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    available_machines = Available_machines(days[0], days[-1])
+    calendar = CapacityCalendar(days, available_machines.new_machine_quantity)
+    calendar.schedule_pm(process_hours_per_day(ordered_part, days, calendar.machine_id))
+    # quality adjusted times, see yield_model.YieldModel
+    demand_index = YieldModel(ordered_part).demand_index(ordered_part)
+    # the machines of every type split over the route steps by their hours, from the data of this run
+    machine_quantity = allocate_machines(ordered_part, available_machines.new_machine_quantity, days,
+                                         demand_index=demand_index)
+    planning = make_planning(ordered_part, machine_quantity, calendar=calendar, demand_index=demand_index)
+    rendered, skipped = render_all(route_load_jobs(planning))
+    print(f"{len(rendered)} route charts drawn, {len(skipped)} unchanged")
@@ -0,0 +1,198 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from daily_demand import active_day_range, demand_and_count, inheriting_parts, planning_days
+from simulation import HOURS_PER_SHIFT, SHIFTS
+
+# rounds of the bisection on the fill level of one order, halves the error every round
+FILL_ITERATIONS = 40
+# repair passes over all orders at most, stops earlier when a pass no longer helps
+REPAIR_PASSES = 5
+# relative improvement of the overflow and peak a repair pass needs to be worth another one
+MIN_IMPROVEMENT = 1e-3
+
+
+def water_fill(load, capacity, weight, pieces):
+    # pieces per day over the days of one window such that the highest utilization of the order's
+    # machine types is as low as it gets: every day is filled up to the same level, a day takes
+    # min over the types of (level x capacity - load) / hours per piece, never below zero
+    used = weight > 0
+    if pieces <= 0 or not np.any(used):
+        return np.full(len(load), pieces / max(len(load), 1))
+    load, capacity, weight = load[:, used], capacity[:, used], weight[used]
+    open_days = np.all(capacity > 0, axis=1)
+    if not np.any(open_days):
+        # none of the days has every machine type of the route, keep the uniform spread
+        return np.full(len(load), pieces / len(load))
+
+    def fill(level):
+        room = (level * capacity - load) / weight
+        return np.where(open_days, np.maximum(room.min(axis=1), 0), 0)
+
+    # at `high` any single open day takes the whole order on its own
+    low = 0.0
+    high = float(np.max(((load + pieces * weight) / np.where(capacity > 0, capacity, np.inf))[open_days]))
+    for _ in range(FILL_ITERATIONS):
+        level = (low + high) / 2
+        if fill(level).sum() < pieces:
+            low = level
+        else:
+            high = level
+    profile = fill(high)
+    return profile * (pieces / profile.sum())
+
+
+def overflow_and_peak(load, capacity):
+    # per machine type the hours above capacity over all days and the highest daily utilization
+    over = np.maximum(load - capacity, 0).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilization = np.where(capacity > 0, load / capacity, np.where(load > 0, np.inf, 0))
+    return over, utilization.max(axis=0, initial=0)
+
+
+class LoadLeveler:
+    # picks the daily production profile of every order inside its window (the day after the order
+    # date up to the delivery date, like daily_demand) so the daily hours per machine type stay as
+    # far under the available hours as they can; sub-parts are made on the same days as the order
+    # they belong to, like the inherited rows of the planning. Greedy: tight and heavy orders
+    # first, each water filled on what is already there; repair: every order is taken out and
+    # filled in again on top of the others, worst windows first
+    def __init__(self, ordered_part, machine_quantity, days=None, calendar=None, demand_index=None):
+        self.ordered_part = ordered_part
+        self.days = planning_days(ordered_part) if days is None else days
+        index = ordered_part.demand_index if demand_index is None else demand_index
+        self.demand_index = index
+        self.machine_id = list(machine_quantity)
+
+        # (day, machine type) hours all machines of a type have, from the calendar when given
+        if calendar is not None:
+            rows = np.searchsorted(calendar.days, self.days)
+            self.capacity = calendar.hours_by_machine_type(self.machine_id)[rows]
+        else:
+            counts = np.array([machine_quantity[m] for m in self.machine_id], dtype=np.float64)
+            self.capacity = np.repeat(counts[None, :] * SHIFTS * HOURS_PER_SHIFT, len(self.days), axis=0)
+
+        # the setup is once per open part per day and stays where the orders are open, the
+        # optimizer only moves the pieces
+        quantity, count = demand_and_count(ordered_part, self.days)
+        self.setup = (count > 0) @ index.by_machine(index.setup_time_by_machine, self.machine_id)
+        self.baseline = self.setup + quantity @ index.by_machine(index.piece_time_by_machine, self.machine_id)
+
+        # orders as they were placed, every piece of an order takes a piece of each part below it
+        table = ordered_part.orders.table
+        own = np.flatnonzero(table.part == table.source_part)
+        self.order_number = table.order_number[own]
+        self.order_part = table.part[own]
+        self.first_day, self.end_day = active_day_range(self.days, table.order_date[own], table.delivery_date[own])
+        self.pieces = table.parts_per_day[own] * np.maximum(self.end_day - self.first_day, 0)
+        inheriting = inheriting_parts(ordered_part)
+        self.inheriting = [(np.array(list(p.keys()), dtype=np.int64), np.array(list(p.values()), dtype=np.float64))
+                           for p in inheriting]
+        piece_time = index.by_machine(index.piece_time_by_machine, self.machine_id)
+        self.weight = np.array([counts @ piece_time[parts] for parts, counts in self.inheriting])
+
+        self.profile = [np.zeros(max(e - f, 0)) for f, e in zip(self.first_day, self.end_day)]
+        self.load = self.setup.copy()
+
+    def _place(self, k, profile, sign=1):
+        self.load[self.first_day[k]:self.end_day[k]] += sign * np.outer(profile, self.weight[self.order_part[k]])
+
+    def _fill(self, k):
+        block = np.s_[self.first_day[k]:self.end_day[k]]
+        return water_fill(self.load[block], self.capacity[block], self.weight[self.order_part[k]], self.pieces[k])
+
+    def _score(self, block):
+        over, peak = overflow_and_peak(self.load[block], self.capacity[block])
+        return over.sum(), np.sum(np.minimum(peak, 1e6))
+
+    def greedy(self):
+        # orders with the fewest days first, within that the most hours first
+        hours = self.pieces * self.weight[self.order_part].sum(axis=1)
+        for k in np.lexsort((-hours, self.end_day - self.first_day)):
+            if self.end_day[k] > self.first_day[k]:
+                self.profile[k] = self._fill(k)
+                self._place(k, self.profile[k])
+        return self
+
+    def repair(self, passes=REPAIR_PASSES, seconds=None):
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        score = self.objective()
+        for _ in range(passes):
+            # the orders whose window reaches the highest utilization go first
+            utilization = np.divide(self.load, self.capacity, out=np.zeros_like(self.load), where=self.capacity > 0)
+            worst = utilization.max(axis=1)
+            window_peak = np.array([worst[f:e].max(initial=0) for f, e in zip(self.first_day, self.end_day)])
+            for k in np.argsort(-window_peak, kind="stable"):
+                if self.end_day[k] <= self.first_day[k]:
+                    continue
+                if deadline is not None and time.perf_counter() > deadline:
+                    return self
+                block = np.s_[self.first_day[k]:self.end_day[k]]
+                before = self._score(block)
+                self._place(k, self.profile[k], -1)
+                profile = self._fill(k)
+                self._place(k, profile)
+                # kept only when neither the overflow nor the peak of the window got worse
+                after = self._score(block)
+                if after[0] <= before[0] and after[1] <= before[1]:
+                    self.profile[k] = profile
+                else:
+                    self._place(k, profile, -1)
+                    self._place(k, self.profile[k])
+            new_score = self.objective()
+            if score - new_score <= MIN_IMPROVEMENT * max(score, 1):
+                break
+            score = new_score
+        return self
+
+    def level(self, passes=REPAIR_PASSES, seconds=None):
+        return self.greedy().repair(passes, seconds)
+
+    def objective(self):
+        # overflow hours plus the peak utilizations, what the repair passes bring down
+        over, peak = overflow_and_peak(self.load, self.capacity)
+        return float(over.sum() + np.minimum(peak, 1e6).sum())
+
+    def demand(self):
+        # (day, part) pieces and whether the part is made that day, like daily_demand.demand_matrix,
+        # so route_time and make_planning take the leveled plan as is; a day a part gets no pieces
+        # has no setup either, so these hours are at most what summary() counts
+        quantity = np.zeros((len(self.days), len(self.ordered_part.part_id)))
+        for k, profile in enumerate(self.profile):
+            parts, counts = self.inheriting[self.order_part[k]]
+            quantity[self.first_day[k]:self.end_day[k], parts] += np.outer(profile, counts)
+        return quantity, quantity > 1e-9
+
+    def schedule(self):
+        # one row per order and day it is worked on, with the pieces of the ordered part that day
+        rows = [(self.order_number[k], self.ordered_part.part_id[self.order_part[k]], self.days[self.first_day[k] + d],
+                 pieces) for k, profile in enumerate(self.profile) for d, pieces in enumerate(profile) if pieces > 1e-9]
+        return pd.DataFrame(rows, columns=["order_number", "part_id", "date", "pieces"])
+
+    def summary(self):
+        # per machine type overflow hours and peak utilization of the uniform spread and the leveled plan
+        over_before, peak_before = overflow_and_peak(self.baseline, self.capacity)
+        over_after, peak_after = overflow_and_peak(self.load, self.capacity)
+        return pd.DataFrame({
+            "overflow_hours_uniform": over_before,
+            "overflow_hours_leveled": over_after,
+            "peak_utilization_uniform": peak_before,
+            "peak_utilization_leveled": peak_after,
+        }, index=pd.Index(self.machine_id, name="machine_type"))
+
+
+if __name__ == "__main__":
+    from make_json_ordered_parts import load_ordered_parts
+    from OEE import Available_machines
+
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    available_machines = Available_machines(days[0], days[-1])
+
+    start = time.perf_counter()
+    leveler = LoadLeveler(ordered_part, available_machines.new_machine_quantity, days).level()
+    print(f"{len(leveler.profile)} orders leveled in {time.perf_counter() - start:.2f} s")
+    print(leveler.summary().to_string())
+    print(leveler.schedule().head(20).to_string(index=False))
@@ -0,0 +1,165 @@
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import numpy as np
+import pandas as pd
+
+from make_json_ordered_parts import load_ordered_parts
+from daily_demand import planning_days, machine_type_load
+from OEE import Available_machines, read_machine_information
+from queueing import QueueingModel
+
+
+class MachineTables:
+    # per machine type and per candidate count: purchase cost, OEE and peak day utilization,
+    # the whole grid is built from these 1D tables so no combination is evaluated twice
+    def __init__(self, machine_id, counts, cost, oee, peak_utilization):
+        self.machine_id = machine_id
+        self.counts = counts
+        self.cost = cost
+        self.oee = oee
+        self.peak_utilization = peak_utilization
+
+
+def build_machine_tables(ordered_part, machine_ranges, available_machines=None, machine_information=None):
+    days = planning_days(ordered_part)
+    if available_machines is None:
+        available_machines = Available_machines(days[0], days[-1])
+    if machine_information is None:
+        machine_information = read_machine_information()
+    machine_id = [m for m in available_machines.machine_id if m in machine_ranges]
+
+    # total process time per machine type, same product as in OEE.py
+    index = ordered_part.demand_index
+    process_time = ordered_part.total_quantity @ index.by_machine(index.process_time_by_machine, machine_id)
+    peak_load = machine_type_load(ordered_part, days, machine_id).max(axis=0)
+
+    counts, cost, oee, peak_utilization = [], [], [], []
+    for k, m in enumerate(machine_id):
+        n = np.array(sorted(machine_ranges[m]), dtype=np.float64)
+        existing = machine_information.loc[m, "Number of machines available"]
+        price = machine_information.loc[m, "Purchase costs (€) (if new)"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            counts.append(n.astype(int))
+            cost.append(np.maximum(n - existing, 0) * price)
+            oee.append(np.where(n > 0, process_time[k] / (n * available_machines.total_time), np.inf))
+            peak_utilization.append(np.where(n > 0, peak_load[k] / (n * available_machines.hours_per_day), np.inf))
+    return MachineTables(machine_id, counts, cost, oee, peak_utilization)
+
+
+def dominates(a, b):
+    return a[0] <= b[0] and a[1] <= b[1] and (a[0] < b[0] or a[1] < b[1])
+
+
+def add_to_front(front, point):
+    # front is a list of (cost, peak utilization, counts) that do not dominate each other
+    for other in front:
+        if other[0] <= point[0] and other[1] <= point[1]:
+            return front
+    front = [other for other in front if not dominates(point, other)]
+    front.append(point)
+    return front
+
+
+def branch_and_bound(tables, prefix=()):
+    # depth first over the machine types, a branch is cut when the cheapest and least
+    # loaded completion it could still reach is already matched by a point on the front
+    n_types = len(tables.machine_id)
+    min_cost = [np.min(c) for c in tables.cost]
+    min_utilization = [np.min(u) for u in tables.peak_utilization]
+    cost_to_go = np.concatenate((np.cumsum(min_cost[::-1])[::-1], [0]))
+    utilization_to_go = [max(min_utilization[k:], default=0) for k in range(n_types + 1)]
+
+    front = []
+
+    def bound_is_dominated(cost, utilization, k):
+        bound = (cost + cost_to_go[k], max(utilization, utilization_to_go[k]))
+        return any(other[0] <= bound[0] and other[1] <= bound[1] for other in front)
+
+    def search(k, chosen, cost, utilization):
+        nonlocal front
+        if bound_is_dominated(cost, utilization, k):
+            return
+        if k == n_types - 1:
+            # the last machine type is done for its whole range at once
+            total_cost = cost + tables.cost[k]
+            total_utilization = np.maximum(utilization, tables.peak_utilization[k])
+            # on equal cost and load the larger machine count is kept
+            for i in np.lexsort((-tables.counts[k], total_utilization, total_cost)):
+                front = add_to_front(front, (total_cost[i], total_utilization[i], chosen + (i,)))
+            return
+        for i in reversed(range(len(tables.counts[k]))):
+            search(k + 1, chosen + (i,), cost + tables.cost[k][i], max(utilization, tables.peak_utilization[k][i]))
+
+    cost = sum(tables.cost[k][i] for k, i in enumerate(prefix))
+    utilization = max((tables.peak_utilization[k][i] for k, i in enumerate(prefix)), default=0)
+    if len(prefix) == n_types:
+        return [(cost, utilization, tuple(prefix))]
+    search(len(prefix), tuple(prefix), cost, utilization)
+    return front
+
+
+def pareto_front(tables, workers=None, split_depth=2):
+    # the first split_depth machine types are fanned out over a process pool,
+    # every worker returns its own front and those are merged here
+    split_depth = min(split_depth, len(tables.machine_id))
+    prefixes = list(itertools.product(*[reversed(range(len(tables.counts[k]))) for k in range(split_depth)]))
+    if workers == 1:
+        fronts = [branch_and_bound(tables, prefix) for prefix in prefixes]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fronts = list(pool.map(branch_and_bound, itertools.repeat(tables), prefixes))
+
+    front = []
+    for point in sorted((p for f in fronts for p in f), key=lambda p: (p[0], p[1])):
+        front = add_to_front(front, point)
+    return scenarios_to_frame(tables, front)
+
+
+def scenarios_to_frame(tables, points):
+    rows = []
+    for cost, utilization, chosen in points:
+        row = {m: int(tables.counts[k][i]) for k, (m, i) in enumerate(zip(tables.machine_id, chosen))}
+        row["purchase_cost"] = float(cost)
+        row["peak_utilization"] = float(utilization)
+        for k, (m, i) in enumerate(zip(tables.machine_id, chosen)):
+            row[f"OEE_{m}"] = float(tables.oee[k][i])
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values("purchase_cost").reset_index(drop=True)
+
+
+def stable_tables(tables, model):
+    # per machine type only the counts the queueing model can run below utilization 1, any other
+    # count gives an infinite lead time whatever the other machine types get
+    keep = []
+    for k, m in enumerate(tables.machine_id):
+        load = model.load[model.machine_id.index(m)] if m in model.machine_id else 0.0
+        keep.append(tables.counts[k] > load)
+        if not keep[-1].any():
+            raise ValueError(f"no count of {m} in its range keeps up with the demand, "
+                             f"it needs more than {load:.2f} machines")
+    return MachineTables(tables.machine_id, *[[column[mask] for column, mask in zip(values, keep)]
+                                              for values in (tables.counts, tables.cost, tables.oee,
+                                                             tables.peak_utilization)])
+
+
+def evaluate_scenarios(ordered_part, machine_ranges, workers=None):
+    # the counts that can not keep up with the demand on average are left out before the front is
+    # built, then every point gets its expected order lead time from the queueing model, well
+    # under a ms each
+    model = QueueingModel(ordered_part)
+    tables = stable_tables(build_machine_tables(ordered_part, machine_ranges), model)
+    front = pareto_front(tables, workers=workers)
+    if all(m in tables.machine_id for m in model.machine_id):
+        front["lead_time_days"] = [model.mean_lead_time_hours(counts) / model.hours_per_day
+                                   for counts in front[tables.machine_id].to_dict("records")]
+    return front
+
+
+if __name__ == "__main__":
+    ordered_part = load_ordered_parts()
+    # up to a few machines above what the queueing model needs to keep up with the demand
+    machine_ranges = {
+        "SM": range(4, 10), "TM": range(3, 7), "MM": range(4, 11), "MC": range(3, 8),
+        "DM": range(2, 7), "GM": range(3, 10), "CMM": range(3, 7), "A": range(2, 8),
+    }
+    print(evaluate_scenarios(ordered_part, machine_ranges).to_string())
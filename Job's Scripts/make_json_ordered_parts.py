@@ -2,143 +2,93 @@ from Classes_setup import *
 import pandas as pd
 import json
 import numpy as np
-
-df = pd.read_csv("../data/Product portfolio.csv")
-
-all_routes = df["Machine routing"].tolist()
-all_setup_time = df["Setup time (h)"].tolist()
-all_process_time = df["Process time (h)"].tolist()
-all_idle_time = df["Idle time (h)"].tolist()
-all_max_transport_batch = df["Max transport batch size (pieces) "].tolist()
-all_avg_idle_time = [all_idle_time[i]/all_max_transport_batch[i] for i in range(len(all_idle_time))]
-all_total_machine_time_all_parts = [sum([all_process_time[i]],all_avg_idle_time[i]) for i in range(len(all_setup_time))]  # setup and idle time left out since it is per batch
-all_sub_part_id = df["Sub assy number"].tolist()
-all_quantity_of_sub_part = df["Number of sub assy's"].tolist()
-
-part_id = df["Part number"]
-stock_size = df["Size (indicative)"]
-price = df["Price per part (€) "]
-
-# start class
-ordered_part = OrderedPart()
-
-# simple parameters
-ordered_part.part_id = part_id.dropna().tolist()
-ordered_part.stock_size = stock_size.dropna().tolist()
-ordered_part.price = price.dropna().tolist()
-
-# finding all rows that correspond to a part
-index_start_part = [None]*len(ordered_part.part_id)
-index_end_part = [None]*len(ordered_part.part_id)
-
-for i in range(1, len(ordered_part.part_id)):
-    index_start_part[i-1] = part_id[part_id ==
-                                    ordered_part.part_id[i-1]].index[0]
-    index_end_part[i-1] = part_id[part_id == ordered_part.part_id[i]].index[0]
-index_start_part[-1] = part_id[part_id == ordered_part.part_id[-1]].index[0]
-index_end_part[-1] = len(part_id)
-
-# saving data in class
-
-
-def save_machining_info_to_class(all_data, class_variable):
-    for i in range(len(ordered_part.part_id)):
-        data = all_data[index_start_part[i]:index_end_part[i]]
-        getattr(ordered_part, class_variable).append(data)
-        setattr(ordered_part, class_variable, [[x for x in inner if not pd.isna(x)] for inner in getattr(
-            ordered_part, class_variable)])  # here im removing the NaN, panda's worked nicely
-
-
-save_machining_info_to_class(all_routes, "route")
-save_machining_info_to_class(all_setup_time, "setup_time")
-save_machining_info_to_class(all_process_time, "process_time")
-save_machining_info_to_class(all_idle_time, "idle_time")
-save_machining_info_to_class(all_avg_idle_time, "avg_idle_time")
-
-save_machining_info_to_class(
-    all_total_machine_time_all_parts, "total_machine_time_all_parts")
-
-
-def save_first_attribute_to_class(all_data, class_variable):
-    for i in range(len(ordered_part.part_id)):
-        data = all_data[index_start_part[i]]
-        getattr(ordered_part, class_variable).append(data)
-
-
-save_first_attribute_to_class(all_max_transport_batch, "max_transport_batch")
-
-df_order = pd.read_csv("../data/Order pattern.csv")
-order_part_id = df_order["Part number"].tolist()
-order_number = df_order["Order number"].tolist()
-quantity = df_order["Number of parts"].tolist()
-order_date = df_order["Order date"].tolist()
-delivery_date = df_order["Desired delivery date"].tolist()
-days_to_produce = [(pd.to_datetime(delivery_date[i]) - pd.to_datetime(order_date[i])).days for i in range(len(order_date))]
-parts_per_day = [quantity[i]/days_to_produce[i] for i in range(len(quantity))]
-
-def write_assembly_data_to_class():
-    ordered_part.is_main_assembly = [False]*len(ordered_part.part_id)
-    ordered_part.is_main_assembly = [
-        p_id.endswith("01") for p_id in ordered_part.part_id]
-
-    # save_machining_info_to_class(all_sub_part_id,"sub_part_id")
-write_assembly_data_to_class()
-
-
-def match_subparts(all_data, class_variable):
-    for i in range(len(ordered_part.part_id)):
-        data = all_data[index_start_part[i]:index_end_part[i]]
-        getattr(ordered_part, class_variable).append(data)
-        setattr(
-            ordered_part,
-            class_variable,
-            [
-                [v for v in inner if not pd.isna(v)]
-                for inner in getattr(ordered_part, class_variable)
-            ]
-        )
-
-
-match_subparts(all_sub_part_id, "sub_part_id")
-match_subparts(all_quantity_of_sub_part, "quantity_of_sub_part")
-
-
-def write_order_to_class():
-    for part_id in ordered_part.part_id:
-        # finding the indices in the order pattern
-        indices_parts = [i for i, x in enumerate(
-            order_part_id) if x == part_id]
-        ordered_part.orders.number_of_orders.append(len(indices_parts))
-
-        ordered_part.orders.order_number.append(
-            [order_number[i] for i in indices_parts])
-        ordered_part.orders.quantity.append(
-            [quantity[i] for i in indices_parts])
-
-        # +int(sum(matching_quantities)))
-        ordered_part.total_quantity.append(
-            sum([quantity[i] for i in indices_parts]))
-        ordered_part.orders.order_date.append(
-            [order_date[i] for i in indices_parts])
-        ordered_part.orders.delivery_date.append(
-            [delivery_date[i] for i in indices_parts])
-        ordered_part.orders.days_to_produce.append([days_to_produce[i] for i in indices_parts])
-        ordered_part.orders.parts_per_day.append([parts_per_day[i] for i in indices_parts])
-
-
-
-write_order_to_class()
-
-
-def assign_sub_part_data_to_class():
+import os
+
+from bom import BomGraph
+from order_stream import CHUNKSIZE, OrderAggregates, parse_order_chunk, read_order_chunks
+from snapshot import SNAPSHOT_PATH, read_snapshot, snapshot_dir, snapshot_matches, write_snapshot
+from workbook import WORKBOOK_PATH, content_hash, read_sheets
+
+PORTFOLIO_PATH = "../data/Product portfolio.csv"
+ORDERS_PATH = "../data/Order pattern.csv"
+JSON_PATH = "../data/ordered_part.json"
+
+
+def rows_per_part(part_column):
+    # every routing row belongs to the last part number above it
+    part_codes, part_ids = pd.factorize(part_column.ffill())
+    return part_codes, part_ids.tolist()
+
+
+def split_per_part(values, part_codes, n_parts):
+    # NaN free values of one column, cut into one list per part in a single pass
+    keep = values.notna().to_numpy() & (part_codes >= 0)
+    codes = part_codes[keep]
+    order = np.argsort(codes, kind="stable")
+    flat = values[keep].to_numpy(dtype=object)[order].tolist()
+    offsets = np.zeros(n_parts + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=n_parts), out=offsets[1:])
+    return [flat[offsets[i]:offsets[i + 1]] for i in range(n_parts)]
+
+
+def save_portfolio_to_class(ordered_part, df):
+    # the csv export keeps the spaces around some headers, the workbook reader strips them
+    df = df.rename(columns=str.strip)
+    part_codes, part_ids = rows_per_part(df["Part number"])
+    n_parts = len(part_ids)
+
+    avg_idle_time = df["Idle time (h)"] / df["Max transport batch size (pieces)"]
+    # setup and idle time left out since it is per batch
+    total_machine_time = df["Process time (h)"] + avg_idle_time
+
+    # the first row of a part holds the part level data
+    first_rows = df[df["Part number"].notna() & ~df["Part number"].duplicated()]
+
+    ordered_part.part_id = part_ids
+    # AGR-053-01 has no size, keep None there so the list stays aligned with part_id
+    ordered_part.stock_size = [None if pd.isna(s) else s for s in first_rows["Size (indicative)"]]
+    ordered_part.price = first_rows["Price per part (€)"].tolist()
+    ordered_part.max_transport_batch = first_rows["Max transport batch size (pieces)"].tolist()
+
+    ordered_part.route = split_per_part(df["Machine routing"], part_codes, n_parts)
+    ordered_part.setup_time = split_per_part(df["Setup time (h)"], part_codes, n_parts)
+    ordered_part.process_time = split_per_part(df["Process time (h)"], part_codes, n_parts)
+    ordered_part.idle_time = split_per_part(df["Idle time (h)"], part_codes, n_parts)
+    ordered_part.avg_idle_time = split_per_part(avg_idle_time, part_codes, n_parts)
+    ordered_part.total_machine_time_all_parts = split_per_part(total_machine_time, part_codes, n_parts)
+    ordered_part.sub_part_id = split_per_part(df["Sub assy number"], part_codes, n_parts)
+    ordered_part.quantity_of_sub_part = split_per_part(df["Number of sub assy's"], part_codes, n_parts)
+
+    ordered_part.is_main_assembly = [p_id.endswith("01") for p_id in ordered_part.part_id]
+
+
+def write_order_to_class(ordered_part, order_chunks):
+    # order_chunks are parsed pieces of the order pattern, see order_stream.read_order_chunks
+    aggregates = OrderAggregates(ordered_part.part_id).add_chunks(order_chunks)
+    orders = aggregates.orders_per_part()
+
+    ordered_part.orders.number_of_orders = aggregates.number_of_orders.tolist()
+    ordered_part.orders.order_number = orders["order_number"]
+    ordered_part.orders.quantity = orders["quantity"]
+    ordered_part.total_quantity = aggregates.total_quantity.tolist()
+    ordered_part.orders.order_date = orders["order_date"]
+    ordered_part.orders.delivery_date = orders["delivery_date"]
+    ordered_part.orders.days_to_produce = orders["days_to_produce"]
+    ordered_part.orders.parts_per_day = orders["parts_per_day"]
+
+
+def assign_sub_part_data_to_class(ordered_part):
     ordered_part.total_sub_part_quantity = [
         [None for _ in sub_parts]
         for sub_parts in ordered_part.sub_part_id
     ]
-    ordered_part.orders.parent_part_id = [[]
-                                          for _ in range(len(ordered_part.part_id))]
-    ordered_part.orders.parent_quantity = [[]
-                                           for _ in range(len(ordered_part.part_id))]
+    ordered_part.orders.parent_part_id = [[] for _ in range(len(ordered_part.part_id))]
+    ordered_part.orders.parent_quantity = [[] for _ in range(len(ordered_part.part_id))]
+
+    # total_quantity holds the own orders here, the BOM graph adds the quantities of every
+    # level above a part, independent of where the parts are in the portfolio
+    bom = BomGraph.from_ordered_part(ordered_part)
+    ordered_part.total_quantity = np.rint(bom.explode(ordered_part.total_quantity)).astype(np.int64).tolist()
 
     for i in range(len(ordered_part.part_id)):
         sub_parts = ordered_part.sub_part_id[i]
@@ -147,93 +97,171 @@ def assign_sub_part_data_to_class():
         number_of_sub_parts = ordered_part.quantity_of_sub_part[i]
         total_number_main_part = ordered_part.total_quantity[i]
 
-        ordered_part.total_sub_part_quantity[i] = [
-            None]*len(number_of_sub_parts)
+        ordered_part.total_sub_part_quantity[i] = [None]*len(number_of_sub_parts)
         # j is the index of the sub part in the main part 1, 2 or 3 maybe 4
         for j, sub_part_id in enumerate(sub_parts):
             if sub_part_id == 'Purch. items':
                 continue
             ordered_part.total_sub_part_quantity[i][j] = (int(total_number_main_part) * int(number_of_sub_parts[j]))
-            index = [i for i, pid in enumerate(
-                ordered_part.part_id) if pid == sub_part_id][0]
-            ordered_part.total_quantity[index] += int(
-                total_number_main_part) * int(number_of_sub_parts[j])
+            index = bom.part_index[sub_part_id]
 
             # hard one to understand, saves order numbers of main parts to subparts
-            ordered_part.orders.order_number[index].append(
-                ordered_part.orders.order_number[i])
-
-            ordered_part.orders.order_date[index].append(
-                ordered_part.orders.order_date[i])
-
-            ordered_part.orders.delivery_date[index].append(
-                ordered_part.orders.delivery_date[i])
-
-            ordered_part.orders.days_to_produce[index].append(
-                ordered_part.orders.days_to_produce[i])
-
-            ordered_part.orders.parts_per_day[index].append(
-                ordered_part.orders.parts_per_day[i])
-
-            ordered_part.orders.parent_part_id[index].append(
-                ordered_part.part_id[i])
+            ordered_part.orders.order_number[index].append(ordered_part.orders.order_number[i])
+            ordered_part.orders.order_date[index].append(ordered_part.orders.order_date[i])
+            ordered_part.orders.delivery_date[index].append(ordered_part.orders.delivery_date[i])
+            ordered_part.orders.days_to_produce[index].append(ordered_part.orders.days_to_produce[i])
+            ordered_part.orders.parts_per_day[index].append(ordered_part.orders.parts_per_day[i])
+            ordered_part.orders.parent_part_id[index].append(ordered_part.part_id[i])
+            ordered_part.orders.parent_quantity[index].append(ordered_part.orders.quantity[i])
 
-            ordered_part.orders.parent_quantity[index].append(
-                ordered_part.orders.quantity[i])
 
-
-assign_sub_part_data_to_class()
-
-
-def update_total_machine_time_all_parts():
+def update_total_machine_time_all_parts(ordered_part):
     for i in range(len(ordered_part.total_machine_time_all_parts)):
         ordered_part.total_machine_time_all_parts[i] = [mt * ordered_part.total_quantity[i] for mt in ordered_part.total_machine_time_all_parts[i]]
         ordered_part.total_machine_time_all_parts[i] = [time + setup_time for time,setup_time in zip(ordered_part.total_machine_time_all_parts[i],ordered_part.setup_time[i])]
         ordered_part.total_time_all_parts.append(sum(ordered_part.total_machine_time_all_parts[i]))
 
-update_total_machine_time_all_parts()
 
+def assign_route_number_to_class(ordered_part):
+    ordered_part.route_number, _ = number_routes(ordered_part.route)
 
-def assign_route_number_to_class():
-    ordered_part.route_number = [None]*len(ordered_part.part_id)
-    route_to_indices = {}
 
-    for i, route in enumerate(ordered_part.route):
-        key = tuple(route)
-        if key not in route_to_indices:
-            route_to_indices[key] = []
-        route_to_indices[key].append(i)
+def build_ordered_part(portfolio_path=PORTFOLIO_PATH, orders_path=ORDERS_PATH, chunksize=CHUNKSIZE):
+    ordered_part = OrderedPart()
+    save_portfolio_to_class(ordered_part, pd.read_csv(portfolio_path))
+    write_order_to_class(ordered_part, read_order_chunks(orders_path, chunksize))
+    assign_sub_part_data_to_class(ordered_part)
+    update_total_machine_time_all_parts(ordered_part)
+    assign_route_number_to_class(ordered_part)
+    return ordered_part
 
-    unique_routes = []
-    indices_per_route = []
-    n = 0
-    for route_tuple, indices in route_to_indices.items():
-        route = list(route_tuple)
-        unique_routes.append(route)
-        indices_per_route.append(indices)
-        for index in indices:
-            ordered_part.route_number[index] = n
-        n += 1
 
-
-assign_route_number_to_class()
+def build_ordered_part_from_workbook(workbook_path=WORKBOOK_PATH):
+    # straight from the planners' workbook, without the csv export in between
+    sheets = read_sheets(["Product portfolio", "Order pattern"], workbook_path)
+    ordered_part = OrderedPart()
+    save_portfolio_to_class(ordered_part, sheets["Product portfolio"])
+    write_order_to_class(ordered_part, [parse_order_chunk(sheets["Order pattern"])])
+    assign_sub_part_data_to_class(ordered_part)
+    update_total_machine_time_all_parts(ordered_part)
+    assign_route_number_to_class(ordered_part)
+    return ordered_part
 
 # --------------------------------------------------------------------------------ChatGPT below
 # Recursive converter
 
 
 def class_to_dict(obj):
-    if hasattr(obj, "__dict__"):
-        return {k: class_to_dict(v) for k, v in obj.__dict__.items()}
+    if isinstance(obj, Ragged):
+        return [class_to_dict(row) for row in obj]
+    elif isinstance(obj, np.ndarray):
+        return np.datetime_as_string(obj).tolist() if obj.dtype.kind == "M" else obj.tolist()
+    elif hasattr(obj, "__dict__"):
+        # the columnar tables of a compacted part are already covered by its views
+        return {k: class_to_dict(v) for k, v in obj.__dict__.items()
+                if not isinstance(v, (OperationTable, OrderTable, DemandIndex, RouteCatalog))}
     elif isinstance(obj, pd.Series):
         return obj.tolist()
     elif isinstance(obj, list):
         return [class_to_dict(i) for i in obj]
     else:
         return obj
+# ----------------------------------------------------------------------------------------------
 
 
-data_dict = class_to_dict(ordered_part)
-# ----------------------------------------------------------------------------------------------
-with open("../data/ordered_part.json", "w") as f:
-    json.dump(data_dict, f, indent=4)
+def dict_to_class(data_dict):
+    # inverse of class_to_dict, rebuilds the classes from the json layout
+    ordered_part = OrderedPart()
+    for k, v in data_dict.items():
+        if k == "orders":
+            for order_k, order_v in v.items():
+                setattr(ordered_part.orders, order_k, order_v)
+        else:
+            setattr(ordered_part, k, v)
+    return ordered_part
+
+
+def write_json(ordered_part, json_path=JSON_PATH):
+    data_dict = class_to_dict(ordered_part)
+    with open(json_path, "w") as f:
+        json.dump(data_dict, f, indent=4)
+
+
+def read_json(json_path=JSON_PATH):
+    with open(json_path) as f:
+        return dict_to_class(json.load(f))
+
+
+def is_newer_than(path, source_paths):
+    # a cached file is only usable when it was written after every csv it came from
+    if not os.path.exists(path):
+        return False
+    mtime = os.path.getmtime(path)
+    return all(mtime >= os.path.getmtime(source) for source in source_paths)
+
+
+# one OrderedPart per (portfolio, orders) pair per process, so every analysis
+# script that is imported in the same process shares the same build
+_loaded_ordered_parts = {}
+
+
+def load_ordered_parts(portfolio_path=PORTFOLIO_PATH, orders_path=ORDERS_PATH, snapshot_path=SNAPSHOT_PATH,
+                       json_path=None):
+    # snapshot first, the json is only read or written when a json_path is given; every pair of
+    # source files has its own snapshot directory under snapshot_path, used only while the
+    # files still have the size and content hash it was built from
+    sources = [portfolio_path, orders_path]
+    key = tuple(os.path.abspath(path) for path in sources)
+    mtimes = tuple(os.path.getmtime(path) for path in sources)
+
+    if key in _loaded_ordered_parts and _loaded_ordered_parts[key][0] == mtimes:
+        return _loaded_ordered_parts[key][1]
+
+    ordered_part = None
+    snapshot = None if snapshot_path is None else snapshot_dir(sources, snapshot_path)
+    if snapshot is not None and snapshot_matches(snapshot, sources):
+        try:
+            ordered_part = read_snapshot(snapshot)
+        except ValueError:
+            # snapshot of an older format, it is rebuilt below
+            ordered_part = None
+    if ordered_part is None and json_path is not None and is_newer_than(json_path, sources):
+        ordered_part = read_json(json_path).compact()
+        if snapshot is not None:
+            write_snapshot(ordered_part, snapshot, sources)
+    if ordered_part is None:
+        ordered_part = build_ordered_part(portfolio_path, orders_path)
+        if json_path is not None:
+            write_json(ordered_part, json_path)
+        ordered_part.compact()
+        if snapshot is not None:
+            write_snapshot(ordered_part, snapshot, sources)
+
+    _loaded_ordered_parts[key] = (mtimes, ordered_part)
+    return ordered_part
+
+
+def load_ordered_parts_from_workbook(workbook_path=WORKBOOK_PATH):
+    # one build per workbook content per process, an edit of the workbook gives a new build
+    key = ("workbook", os.path.abspath(workbook_path))
+    workbook_hash = content_hash(workbook_path)
+    if key in _loaded_ordered_parts and _loaded_ordered_parts[key][0] == workbook_hash:
+        return _loaded_ordered_parts[key][1]
+    ordered_part = build_ordered_part_from_workbook(workbook_path).compact()
+    _loaded_ordered_parts[key] = (workbook_hash, ordered_part)
+    return ordered_part
+
+
+def __getattr__(name):
+    # old scripts do `from make_json_ordered_parts import ordered_part`, this keeps
+    # that working without building anything when the module is only imported
+    if name == "ordered_part":
+        return load_ordered_parts()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    ordered_part = build_ordered_part()
+    write_json(ordered_part)
+    sources = [PORTFOLIO_PATH, ORDERS_PATH]
+    write_snapshot(ordered_part, snapshot_dir(sources), sources)
@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from daily_demand import active_day_range, planning_days
+from yield_model import YieldModel
+
+# coefficient of variation of the quantity of an order
+QUANTITY_CV = 0.2
+# standard deviation in days of the shift of a delivery date, shifts are cut off at 3 of them
+DUE_DATE_SD = 2.0
+# coefficient of variation of the process time of a routing step
+PROCESS_TIME_CV = 0.1
+# coefficient of variation of the scrap and rework rates of a routing step around the machine average
+SCRAP_CV = 0.5
+REWORK_CV = 0.5
+# replications per block, one block is one (replication, day, routing step) array in memory
+BLOCK_SIZE = 100
+PERCENTILES = (50, 90, 99)
+
+
+def lognormal_factors(rng, cv, size):
+    # factors with mean 1 and the given coefficient of variation, all 1 for cv 0
+    sigma2 = np.log1p(cv ** 2)
+    return rng.lognormal(-sigma2 / 2, np.sqrt(sigma2), size)
+
+
+def gamma_around(rng, mean, cv, size):
+    # non negative values around mean with the given coefficient of variation, mean itself for cv 0
+    if cv <= 0:
+        return np.broadcast_to(mean, size).copy()
+    return rng.gamma(1 / cv ** 2, cv ** 2, size) * mean
+
+
+class MonteCarloPlanning:
+    # the daily planning with a replication axis in front: per replication the order quantities,
+    # delivery dates, process times and scrap rates are drawn, and the (day, route, step) hours
+    # of daily_demand.route_time are computed for a whole block of replications at once. With
+    # every spread at zero a replication is the quality adjusted planning of get_daily_data.
+    # Only arrays are kept, so the model is cheap to send to a worker process
+    def __init__(self, ordered_part, machine_types=None, quantity_cv=QUANTITY_CV, due_date_sd=DUE_DATE_SD,
+                 process_time_cv=PROCESS_TIME_CV, scrap_cv=SCRAP_CV, rework_cv=REWORK_CV, machine_information=None):
+        self.quantity_cv = quantity_cv
+        self.due_date_sd = due_date_sd
+        self.process_time_cv = process_time_cv
+        self.scrap_cv = scrap_cv
+        self.rework_cv = rework_cv
+        self.max_shift = int(np.ceil(3 * due_date_sd))
+
+        # order rows, the inherited rows of a sub-part move with the order they come from
+        table = ordered_part.orders.table
+        self.part = table.part
+        self.n_parts = len(ordered_part.part_id)
+        self.order_number, self.order = np.unique(table.order_number, return_inverse=True)
+        self.order_date = table.order_date
+        self.delivery_date = table.delivery_date
+        self.pieces = table.parts_per_day * (table.delivery_date - table.order_date).astype(np.int64)
+        days = planning_days(ordered_part)
+        self.days = np.arange(days[0], days[-1] + self.max_shift + 1)
+
+        # routing steps, the quality losses go through the yield model with the drawn rates
+        operations = ordered_part.operations
+        self.operation_part = operations.part_of_operation()
+        self.process_time = operations.process_time
+        self.idle_time = operations.avg_idle_time
+        self.setup_time = operations.setup_time
+        self.yields = YieldModel(ordered_part, machine_information)
+
+        # routing step to (route, step) column, and (route, step) column to machine type
+        index = ordered_part.demand_index
+        self.shape = (index.n_routes, index.n_steps)
+        step = np.arange(len(operations)) - operations.offsets[self.operation_part]
+        column = np.asarray(ordered_part.route_number)[self.operation_part] * index.n_steps + step
+        self.operation_to_column = np.zeros((len(operations), index.n_routes * index.n_steps))
+        self.operation_to_column[np.arange(len(operations)), column] = 1
+        self.machine_id = list(index.machine_id) if machine_types is None else list(machine_types)
+        columns = index.machine_columns(self.machine_id)
+        self.column_to_machine = np.zeros((index.n_routes * index.n_steps, len(self.machine_id)))
+        self.column_to_machine[:, columns >= 0] = index.step_to_machine()[:, columns[columns >= 0]]
+
+    def sample_demand(self, rng, size):
+        # (replication, day, part) pieces per day and whether the part has an open order
+        n_days, n_orders = len(self.days), len(self.order_number)
+        quantity_factor = gamma_around(rng, 1.0, self.quantity_cv, (size, n_orders))[:, self.order]
+        shift = np.clip(np.rint(rng.normal(0, 1, (size, n_orders)) * self.due_date_sd),
+                        -self.max_shift, self.max_shift).astype(np.int64)[:, self.order]
+        delivery_date = np.maximum(self.delivery_date + shift, self.order_date + 1)
+        days_to_produce = (delivery_date - self.order_date).astype(np.int64)
+        parts_per_day = self.pieces * quantity_factor / days_to_produce
+
+        # the sweep line of daily_demand.demand_and_count with the replication as the outer axis
+        first_day, end_day = active_day_range(self.days, self.order_date, delivery_date)
+        block = (np.arange(size)[:, None] * (n_days + 1))
+        start_index = ((block + first_day) * self.n_parts + self.part).ravel()
+        end_index = ((block + end_day) * self.n_parts + self.part).ravel()
+        cells = size * (n_days + 1) * self.n_parts
+        quantity = np.bincount(start_index, weights=parts_per_day.ravel(), minlength=cells)
+        quantity -= np.bincount(end_index, weights=parts_per_day.ravel(), minlength=cells)
+        count = np.bincount(start_index, minlength=cells) - np.bincount(end_index, minlength=cells)
+        quantity = np.cumsum(quantity.reshape(size, n_days + 1, self.n_parts)[:, :-1], axis=1)
+        count = np.cumsum(count.reshape(size, n_days + 1, self.n_parts)[:, :-1], axis=1)
+        quantity[count == 0] = 0
+        return quantity, count > 0
+
+    def sample_times(self, rng, size):
+        # (replication, routing step) hours per good piece and per setup, the times of
+        # DemandIndex.from_ordered_part with the drawn process times, scrap and rework rates
+        n = len(self.process_time)
+        process_factor = lognormal_factors(rng, self.process_time_cv, (size, n))
+        scrap = np.minimum(gamma_around(rng, self.yields.scrap, self.scrap_cv, (size, n)), 0.95)
+        rework = gamma_around(rng, self.yields.rework, self.rework_cv, (size, n))
+        yields = self.yields.with_rates(scrap, rework)
+        piece_time = yields.piece_time(self.idle_time, self.process_time * process_factor)
+        # the startup defects are a share of a batch of pieces, so they scale with the process time
+        setup_time = self.setup_time + yields.startup_hours * process_factor
+        return piece_time, setup_time
+
+    def route_time_block(self, rng, size):
+        # (replication, day, route, step) hours
+        quantity, active = self.sample_demand(rng, size)
+        piece_time, setup_time = self.sample_times(rng, size)
+        hours = (quantity[:, :, self.operation_part] * piece_time[:, None, :]
+                 + active[:, :, self.operation_part] * setup_time[:, None, :])
+        return (hours @ self.operation_to_column).reshape(size, len(self.days), *self.shape)
+
+    def machine_load_block(self, rng, size):
+        # (replication, day, machine type) hours
+        route_time = self.route_time_block(rng, size)
+        return route_time.reshape(size, len(self.days), -1) @ self.column_to_machine
+
+    def run(self, replications=1000, seed=0, workers=None, block_size=BLOCK_SIZE):
+        # (replication, day, machine type) hours of all replications; every block has its own
+        # seed from one SeedSequence, so the result does not depend on the number of workers
+        sizes = [min(block_size, replications - start) for start in range(0, replications, block_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        jobs = [(self, s, size) for s, size in zip(seeds, sizes)]
+        if workers == 1 or len(jobs) <= 1:
+            blocks = [run_block(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                blocks = list(pool.map(run_block, jobs))
+        return np.concatenate(blocks) if blocks else np.zeros((0, len(self.days), len(self.machine_id)))
+
+    def percentiles(self, loads, percentiles=PERCENTILES):
+        # one row per day and machine type with the mean and the percentiles of the hours
+        values = np.percentile(loads, percentiles, axis=0)
+        day, machine = np.indices(loads.shape[1:]).reshape(2, -1)
+        frame = pd.DataFrame({"date": self.days[day], "machine_type": np.asarray(self.machine_id)[machine],
+                              "mean": loads.mean(axis=0).ravel()})
+        for p, value in zip(percentiles, values):
+            frame[f"p{p}"] = value.ravel()
+        return frame
+
+
+def run_block(job):
+    model, seed, size = job
+    return model.machine_load_block(np.random.default_rng(seed), size)
+
+
+if __name__ == "__main__":
+    import time
+    from make_json_ordered_parts import load_ordered_parts
+    from OEE import Available_machines
+
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    available_machines = Available_machines(days[0], days[-1])
+    model = MonteCarloPlanning(ordered_part, available_machines.machine_id)
+
+    start = time.perf_counter()
+    loads = model.run(1000)
+    print(f"{len(loads)} replications in {time.perf_counter() - start:.2f} s")
+    table = model.percentiles(loads)
+    print(table[table["date"] == table["date"].iloc[len(table) // 2]].to_string(index=False))
+
+    # days a machine type needs more hours than its machines have in 1 of 10 replications
+    capacity = pd.Series(available_machines.new_machine_quantity) * available_machines.hours_per_day
+    table["capacity"] = table["machine_type"].map(capacity)
+    print((table["p90"] > table["capacity"]).groupby(table["machine_type"]).sum().to_string())
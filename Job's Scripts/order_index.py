@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+from bom import BomGraph
+
+# intervals per leaf of the tree, below this a vectorized scan is faster than another level
+LEAF_SIZE = 64
+
+
+def as_days(values):
+    # dates (datetime64, strings, datetime.date) or plain integers as an int64 array
+    values = np.asarray(values)
+    if values.dtype.kind in "MUSO":
+        values = values.astype("datetime64[D]")
+    return values.astype(np.int64)
+
+
+class IntervalIndex:
+    # static centred interval tree over closed intervals [start, end], built in one go from two
+    # arrays: every node keeps the intervals that contain its centre sorted by start and by end,
+    # the ones left and right of the centre go to its children, so a stabbing or window query
+    # visits O(log n) nodes and takes the matches of a node as one slice
+    def __init__(self, start, end, leaf_size=LEAF_SIZE):
+        self.start = as_days(start)
+        self.end = as_days(end)
+        if self.start.shape != self.end.shape:
+            raise ValueError("start and end need the same length")
+        if np.any(self.end < self.start):
+            raise ValueError("an interval ends before it starts")
+        self.leaf_size = leaf_size
+
+        self.center, self.left, self.right, self.leaf = [], [], [], []
+        by_start, by_end, sizes = [], [], []
+        if len(self.start):
+            self._build(np.arange(len(self.start)), by_start, by_end, sizes)
+        self.offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+        self.by_start = np.concatenate(by_start) if by_start else np.zeros(0, dtype=np.int64)
+        self.by_end = np.concatenate(by_end) if by_end else np.zeros(0, dtype=np.int64)
+        self.sorted_start = self.start[self.by_start]
+        # negated so the ends sorted from late to early are ascending for searchsorted
+        self.sorted_end = -self.end[self.by_end]
+        self.center = np.array(self.center, dtype=np.int64)
+        self.left = np.array(self.left, dtype=np.int64)
+        self.right = np.array(self.right, dtype=np.int64)
+        self.leaf = np.array(self.leaf, dtype=bool)
+
+    def _build(self, rows, by_start, by_end, sizes):
+        node = len(self.center)
+        self.center.append(0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.leaf.append(len(rows) <= self.leaf_size)
+        start, end = self.start[rows], self.end[rows]
+        here = rows
+        if not self.leaf[node]:
+            # the middle endpoint is an endpoint of some interval, so no node is empty
+            points = np.concatenate([start, end])
+            center = np.partition(points, len(points) // 2)[len(points) // 2]
+            self.center[node] = center
+            here = rows[(start <= center) & (end >= center)]
+        by_start.append(here[np.argsort(self.start[here], kind="stable")])
+        by_end.append(here[np.argsort(-self.end[here], kind="stable")])
+        sizes.append(len(here))
+        if not self.leaf[node]:
+            left, right = rows[end < center], rows[start > center]
+            if len(left):
+                self.left[node] = self._build(left, by_start, by_end, sizes)
+            if len(right):
+                self.right[node] = self._build(right, by_start, by_end, sizes)
+        return node
+
+    def __len__(self):
+        return len(self.start)
+
+    def overlapping(self, first, last):
+        # positions of the intervals that share at least one day with [first, last], ascending
+        first, last = int(as_days(first)), int(as_days(last))
+        found = []
+        stack = [0] if len(self.center) else []
+        while stack:
+            node = stack.pop()
+            lo, hi = self.offsets[node], self.offsets[node + 1]
+            if self.leaf[node]:
+                rows = self.by_start[lo:lo + np.searchsorted(self.sorted_start[lo:hi], last, side="right")]
+                found.append(rows[self.end[rows] >= first])
+                continue
+            center = self.center[node]
+            if last < center:
+                # every interval here ends at or after the centre, only the start is left to check
+                found.append(self.by_start[lo:lo + np.searchsorted(self.sorted_start[lo:hi], last, side="right")])
+            elif first > center:
+                found.append(self.by_end[lo:lo + np.searchsorted(self.sorted_end[lo:hi], -first, side="right")])
+            else:
+                found.append(self.by_start[lo:hi])
+            if first < center and self.left[node] >= 0:
+                stack.append(self.left[node])
+            if last > center and self.right[node] >= 0:
+                stack.append(self.right[node])
+        return np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def containing(self, day):
+        # stabbing query: the intervals that contain day
+        return self.overlapping(day, day)
+
+
+class OrderIndex:
+    # every order row of ordered_part.orders.table, own and inherited ones, by the days it is
+    # worked on: from the day after the order date up to and including the delivery date, the
+    # same days daily_demand.active_day_range counts
+    def __init__(self, ordered_part, bom=None):
+        self.ordered_part = ordered_part
+        self.table = ordered_part.orders.table
+        self.tree = IntervalIndex(self.table.order_date + 1, self.table.delivery_date)
+        self.bom = bom
+        self.part_index = {p: i for i, p in reversed(list(enumerate(ordered_part.part_id)))}
+
+    def parts(self, parts=None, routes=None, machine_types=None, sub_parts=False):
+        # boolean mask over the parts that pass every given filter, None when nothing is filtered;
+        # parts are part ids or positions, sub_parts adds every part below them in the BOM
+        if parts is None and routes is None and machine_types is None:
+            return None
+        mask = np.ones(len(self.ordered_part.part_id), dtype=bool)
+        if parts is not None:
+            chosen = [self.part_index[p] if isinstance(p, str) else int(p) for p in np.atleast_1d(parts)]
+            if sub_parts:
+                if self.bom is None:
+                    self.bom = BomGraph.from_ordered_part(self.ordered_part)
+                chosen = [c for p in chosen for c in self.bom.path_counts(p)]
+            mask &= np.isin(np.arange(len(mask)), chosen)
+        if routes is not None:
+            mask &= np.isin(self.ordered_part.route_number, np.atleast_1d(routes))
+        if machine_types is not None:
+            operations = self.ordered_part.operations
+            uses = operations.part_of_operation()[np.isin(operations.route, np.atleast_1d(machine_types))]
+            mask &= np.isin(np.arange(len(mask)), uses)
+        return mask
+
+    def _filter(self, rows, parts, routes, machine_types, sub_parts):
+        mask = self.parts(parts, routes, machine_types, sub_parts)
+        return rows if mask is None else rows[mask[self.table.part[rows]]]
+
+    def active(self, day, parts=None, routes=None, machine_types=None, sub_parts=False):
+        # order rows worked on that day
+        return self._filter(self.tree.containing(day), parts, routes, machine_types, sub_parts)
+
+    def window(self, first_day, last_day, parts=None, routes=None, machine_types=None, sub_parts=False):
+        # order rows worked on at least one day between first_day and last_day
+        return self._filter(self.tree.overlapping(first_day, last_day), parts, routes, machine_types, sub_parts)
+
+    def to_frame(self, rows):
+        part_id = np.asarray(self.ordered_part.part_id, dtype=object)
+        table = self.table
+        return pd.DataFrame({
+            "order_number": table.order_number[rows],
+            "part_id": part_id[table.part[rows]],
+            "ordered_part": part_id[table.source_part[rows]],
+            "inherited": table.part[rows] != table.source_part[rows],
+            "order_date": table.order_date[rows],
+            "delivery_date": table.delivery_date[rows],
+            "parts_per_day": table.parts_per_day[rows],
+        })
+
+
+if __name__ == "__main__":
+    from make_json_ordered_parts import load_ordered_parts
+
+    ordered_part = load_ordered_parts()
+    index = OrderIndex(ordered_part)
+    rows = index.window("2025-09-01", "2025-09-14", parts="AU-002-01", sub_parts=True)
+    print(index.to_frame(rows).to_string(index=False))
+    print(len(index.active("2025-10-01", machine_types="DM")), "order rows on a drilling machine route on 2025-10-01")
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+CHUNKSIZE = 100_000
+ORDER_COLUMNS = ["Order number", "Part number", "Number of parts", "Order date", "Desired delivery date"]
+
+
+def parse_order_chunk(chunk):
+    # dates are parsed for the whole chunk at once instead of row by row
+    order_date = pd.to_datetime(chunk["Order date"], format="ISO8601")
+    delivery_date = pd.to_datetime(chunk["Desired delivery date"], format="ISO8601")
+    chunk = chunk.copy()
+    # days since 1970-01-01, pandas would turn a datetime64[D] column back into seconds
+    chunk["order_day"] = order_date.to_numpy().astype("datetime64[D]").astype(np.int64)
+    chunk["delivery_day"] = delivery_date.to_numpy().astype("datetime64[D]").astype(np.int64)
+    chunk["days_to_produce"] = (delivery_date - order_date).dt.days
+    # the same ISO date strings whether the chunk came from the csv or as timestamps from the workbook
+    chunk["Order date"] = order_date.dt.strftime("%Y-%m-%d")
+    chunk["Desired delivery date"] = delivery_date.dt.strftime("%Y-%m-%d")
+    chunk["parts_per_day"] = chunk["Number of parts"] / chunk["days_to_produce"]
+    return chunk
+
+
+def read_order_chunks(path, chunksize=CHUNKSIZE):
+    # the order pattern in pieces of chunksize rows, memory stays the same for any file size
+    for chunk in pd.read_csv(path, usecols=ORDER_COLUMNS, chunksize=chunksize):
+        yield parse_order_chunk(chunk)
+
+
+class OrderAggregates:
+    # per part totals updated chunk by chunk, with daily=True also a day x part difference array of
+    # parts_per_day for demand(); with keep_orders=False nothing grows with the number of orders,
+    # only with parts x days
+    def __init__(self, part_id, keep_orders=True, daily=False):
+        self.part_id = part_id
+        self.part_index = pd.Series(np.arange(len(part_id)), index=pd.Index(part_id)).groupby(level=0).first()
+        self.keep_orders = keep_orders
+        self.daily = daily
+        self.total_quantity = np.zeros(len(part_id), dtype=np.int64)
+        self.number_of_orders = np.zeros(len(part_id), dtype=np.int64)
+
+        self.first_day = None
+        self.quantity_diff = np.zeros((0, len(part_id)))
+        self.count_diff = np.zeros((0, len(part_id)), dtype=np.int64)
+
+        self._chunks = []
+
+    def _grow(self, first_day, end_day):
+        # keeps the difference arrays large enough for days first_day up to end_day
+        if self.first_day is None:
+            self.first_day = first_day
+        before = max(self.first_day - first_day, 0)
+        after = max(end_day - (self.first_day + len(self.quantity_diff)) + 1, 0)
+        if before or after:
+            pad = ((before, after), (0, 0))
+            self.quantity_diff = np.pad(self.quantity_diff, pad)
+            self.count_diff = np.pad(self.count_diff, pad)
+            self.first_day -= before
+
+    def add_chunk(self, chunk):
+        part = self.part_index.reindex(chunk["Part number"]).to_numpy()
+        # orders of parts that are not in the portfolio are skipped, like before
+        known = ~np.isnan(part)
+        chunk = chunk[known]
+        part = part[known].astype(np.int64)
+        if len(chunk) == 0:
+            return
+
+        n_parts = len(self.part_id)
+        quantity = chunk["Number of parts"].to_numpy(dtype=np.int64)
+        self.total_quantity += np.bincount(part, weights=quantity, minlength=n_parts).astype(np.int64)
+        self.number_of_orders += np.bincount(part, minlength=n_parts)
+
+        parts_per_day = chunk["parts_per_day"].to_numpy(dtype=np.float64)
+        if self.daily:
+            # worked on from the day after the order date up to and including the delivery date
+            first_day = chunk["order_day"].to_numpy() + 1
+            end_day = chunk["delivery_day"].to_numpy() + 1
+            self._grow(int(first_day.min()), int(end_day.max()))
+            np.add.at(self.quantity_diff, (first_day - self.first_day, part), parts_per_day)
+            np.add.at(self.quantity_diff, (end_day - self.first_day, part), -parts_per_day)
+            np.add.at(self.count_diff, (first_day - self.first_day, part), 1)
+            np.add.at(self.count_diff, (end_day - self.first_day, part), -1)
+
+        if self.keep_orders:
+            self._chunks.append({
+                "part": part,
+                "order_number": chunk["Order number"].to_numpy(),
+                "quantity": quantity,
+                "order_date": chunk["Order date"].to_numpy(dtype=object),
+                "delivery_date": chunk["Desired delivery date"].to_numpy(dtype=object),
+                "days_to_produce": chunk["days_to_produce"].to_numpy(),
+                "parts_per_day": parts_per_day,
+            })
+
+    def add_chunks(self, chunks):
+        for chunk in chunks:
+            self.add_chunk(chunk)
+        return self
+
+    def orders_per_part(self):
+        # {column: list per part} in file order, only available with keep_orders=True
+        if not self.keep_orders:
+            raise ValueError("orders were not kept, use OrderAggregates(..., keep_orders=True)")
+        n_parts = len(self.part_id)
+        fields = ["order_number", "quantity", "order_date", "delivery_date", "days_to_produce", "parts_per_day"]
+        if not self._chunks:
+            return {field: [[] for _ in range(n_parts)] for field in fields}
+        part = np.concatenate([c["part"] for c in self._chunks])
+        order = np.argsort(part, kind="stable")
+        offsets = np.zeros(n_parts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(part, minlength=n_parts), out=offsets[1:])
+        result = {}
+        for field in fields:
+            values = np.concatenate([c[field] for c in self._chunks])[order].tolist()
+            result[field] = [values[offsets[i]:offsets[i + 1]] for i in range(n_parts)]
+        return result
+
+    def _check_daily(self):
+        if not self.daily:
+            raise ValueError("daily demand was not kept, use OrderAggregates(..., daily=True)")
+
+    def days(self):
+        self._check_daily()
+        if self.first_day is None:
+            return np.array([], dtype="datetime64[D]")
+        return np.datetime64(int(self.first_day), "D") + np.arange(len(self.quantity_diff) - 1)
+
+    def demand(self, bom=None):
+        # (day, part) parts per day and open order counts of the days(), own orders only unless
+        # bom (bom.BomGraph) is given to pass them down the sub-parts once per path
+        self._check_daily()
+        quantity = np.cumsum(self.quantity_diff[:-1], axis=0)
+        count = np.cumsum(self.count_diff[:-1], axis=0)
+        if bom is not None:
+            quantity = bom.explode(quantity, weighted=False)
+            count = np.rint(bom.explode(count, weighted=False)).astype(np.int64)
+        quantity[count == 0] = 0
+        return quantity, count
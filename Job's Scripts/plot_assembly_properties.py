@@ -1,7 +1,9 @@
-from matplotlib import pyplot as plt
 from pygments.lexers import go
-from make_json_ordered_parts import ordered_part
+from make_json_ordered_parts import load_ordered_parts
 from plotly.colors import qualitative
+from render import FIGURE_DIR, bar_series, render_all
+import os
+
 #todo under development by Job
 def build_part_color_map(all_parts_import):
     all_parts = [part for part in all_parts_import if part.endswith("01")]
@@ -12,7 +14,7 @@ def build_part_color_map(all_parts_import):
 
     return color_map
 
-def plot_different_properties(properties, units):
+def different_properties_series(ordered_part, properties, units):
     x_property = properties[0]
     y_property = properties[1]
 
@@ -37,19 +39,18 @@ def plot_different_properties(properties, units):
         else:
             color_values[i] = color_map[part_numbers[0]]
 
-    plt.figure()
-    plt.bar(x_values, y_values, color=color_values)
-    plt.xlabel(x_property + " [" + units[0] + "]")
-    plt.ylabel(y_property + " [" + units[1] + "]")
-    plt.title(f"{y_property} per {x_property}")
-    plt.xticks(rotation=90)
-    plt.tight_layout()
-    plt.show()
-
-
-properties = [["part_id", "total_quantity"],
-              ["part_id", "total_time_all_parts"]]
-units = [["-", "-"],
-         ["-", "hours"]]
-for i, property in enumerate(properties):
-    plot_different_properties(property, units[i])
\ No newline at end of file
+    return bar_series(x_values, y_values, color_values, x_property + " [" + units[0] + "]",
+                      y_property + " [" + units[1] + "]", f"{y_property} per {x_property}")
+
+
+if __name__ == "__main__":
+    ordered_part = load_ordered_parts()
+    properties = [["part_id", "total_quantity"],
+                  ["part_id", "total_time_all_parts"]]
+    units = [["-", "-"],
+             ["-", "hours"]]
+    jobs = []
+    for i, property in enumerate(properties):
+        path = os.path.join(FIGURE_DIR, f"assembly_{property[1]}_per_{property[0]}.png")
+        jobs.append(("bar", different_properties_series(ordered_part, property, units[i]), path))
+    render_all(jobs)
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+from bom import BomGraph
+from daily_demand import planning_days
+from simulation import HOURS_PER_SHIFT, SHIFTS, read_maintenance, read_pm_intervals
+
+# squared coefficient of variation of the time between orders, 1 is a Poisson stream
+ORDER_SCV = 1.0
+# the arrival variability of the stations is a fixed point over the routes, this many rounds at most
+MAX_ITERATIONS = 50
+
+
+def erlang_c(servers, load):
+    # probability that an arrival has to wait at an M/M/c station with `load` = arrival rate x
+    # service time, over arrays of stations; Erlang B by its recurrence, then Erlang C from it
+    servers = np.asarray(servers, dtype=np.int64)
+    load = np.asarray(load, dtype=np.float64)
+    blocking = np.ones_like(load)
+    for n in range(1, int(servers.max(initial=0)) + 1):
+        step = n <= servers
+        blocking[step] = load[step] * blocking[step] / (n + load[step] * blocking[step])
+    utilization = np.divide(load, servers, out=np.full_like(load, np.inf), where=servers > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wait = blocking / (1 - utilization * (1 - blocking))
+    return np.where(utilization < 1, wait, 1.0)
+
+
+class QueueingModel:
+    # open queueing network of the shop floor: every machine type is a station with as many
+    # servers as machines, a customer is one transport batch of a part and visits the stations of
+    # its route in order; waiting per station is the Allen-Cunneen GI/G/c approximation, with the
+    # arrival variability passed along the routes like QNA does. Everything that does not depend on
+    # the machine counts is done here once, evaluate() is then a few array operations
+    def __init__(self, ordered_part, days=None, maintenance=None, hours_per_day=SHIFTS * HOURS_PER_SHIFT, bom=None,
+                 pm_intervals=None):
+        days = planning_days(ordered_part) if days is None else days
+        operations = ordered_part.operations
+        self.ordered_part = ordered_part
+        self.bom = BomGraph.from_ordered_part(ordered_part) if bom is None else bom
+        self.hours_per_day = hours_per_day
+
+        # pieces per working hour of every part: its parts_per_day summed over the planning days,
+        # with the pieces per parent of the BOM like total_quantity has them
+        total_quantity = np.asarray(ordered_part.total_quantity, dtype=np.float64)
+        piece_rate = total_quantity / (len(days) * hours_per_day)
+        batch = np.asarray(ordered_part.max_transport_batch, dtype=np.float64)
+
+        # one flow per routing step of a part with demand
+        part = operations.part_of_operation()
+        used = piece_rate[part] > 0
+        self.flow_part = part[used]
+        self.machine_id = list(dict.fromkeys(operations.route[used].tolist()))
+        machine_index = {m: k for k, m in enumerate(self.machine_id)}
+        self.flow_station = np.array([machine_index[m] for m in operations.route[used]], dtype=np.int64)
+        self.flow_rate = (piece_rate / batch)[self.flow_part]
+        # a batch takes its pieces one after the other plus one setup, the setup per piece is
+        # setup_time / max_transport_batch
+        per_piece = operations.process_time[used] + operations.avg_idle_time[used]
+        self.flow_service = batch[self.flow_part] * per_piece + operations.setup_time[used]
+        self.flow_pieces = batch[self.flow_part]
+
+        # the step before every flow on the same part, -1 for the first step of a route
+        first = np.r_[True, self.flow_part[1:] != self.flow_part[:-1]]
+        self.flow_previous = np.where(first, -1, np.arange(len(self.flow_part)) - 1)
+
+        # an order is released as all its transport batches at once, so the batches of a part
+        # arrive in bulks of K: the variability of that stream is ORDER_SCV E[K] + Var(K) / E[K]
+        table = ordered_part.orders.table
+        pieces = table.parts_per_day * table.days_to_produce
+        # the order rows of a sub-part hold the pieces of the parent order, scaled to the BOM here
+        row_total = np.bincount(table.part, weights=pieces, minlength=len(batch))
+        scale = np.divide(total_quantity, row_total, out=np.ones(len(batch)), where=row_total > 0)
+        bulk = np.ceil(pieces * scale[table.part] / batch[table.part])
+        orders = np.bincount(table.part, minlength=len(batch))
+        mean_bulk = np.bincount(table.part, weights=bulk, minlength=len(batch)) / np.maximum(orders, 1)
+        bulk_variance = (np.bincount(table.part, weights=bulk ** 2, minlength=len(batch)) / np.maximum(orders, 1)
+                         - mean_bulk ** 2)
+        release_scv = ORDER_SCV * mean_bulk + np.divide(bulk_variance, mean_bulk, out=np.zeros(len(batch)),
+                                                        where=mean_bulk > 0)
+        self.release_scv = np.maximum(release_scv, ORDER_SCV)[self.flow_part]
+
+        # share of a machine's time left for production after cleaning, inspection and maintenance
+        maintenance = read_maintenance() if maintenance is None else maintenance
+        minor_pm_after, major_pm_after = read_pm_intervals() if pm_intervals is None else pm_intervals
+        per_type = maintenance.reindex(self.machine_id).fillna(0)
+        shift_share = 1 - per_type["cit_per_shift"].to_numpy() / HOURS_PER_SHIFT
+        # a major maintenance takes the place of the minor one that is due at the same time
+        pm_per_hour = (per_type["minor_pm_time"].to_numpy() * (1 / minor_pm_after - 1 / major_pm_after)
+                       + per_type["major_pm_time"].to_numpy() / major_pm_after)
+        self.flow_service = self.flow_service * (1 + pm_per_hour[self.flow_station]) / shift_share[self.flow_station]
+
+        n = len(self.machine_id)
+        self.arrival_rate = np.bincount(self.flow_station, weights=self.flow_rate, minlength=n)
+        self.service_time = np.bincount(self.flow_station, weights=self.flow_rate * self.flow_service,
+                                        minlength=n) / self.arrival_rate
+        second_moment = np.bincount(self.flow_station, weights=self.flow_rate * self.flow_service ** 2,
+                                    minlength=n) / self.arrival_rate
+        self.service_scv = second_moment / self.service_time ** 2 - 1
+        self.load = self.arrival_rate * self.service_time
+
+    def servers(self, machine_quantity):
+        missing = [m for m in self.machine_id if m not in machine_quantity]
+        if missing:
+            raise ValueError(f"no machine count for {missing}")
+        return np.array([int(machine_quantity[m]) for m in self.machine_id], dtype=np.int64)
+
+    def evaluate(self, machine_quantity):
+        # per station utilization, arrival variability and waiting hours, and per flow the hours
+        # from arriving at the station to leaving it; inf everywhere downstream of a full station
+        servers = self.servers(machine_quantity)
+        utilization = np.divide(self.load, servers, out=np.full_like(self.load, np.inf), where=servers > 0)
+        stable = utilization < 1
+        rho = np.minimum(utilization, 0.999)
+
+        # QNA: a station's departures mix its arrival and service variability, a flow that leaves
+        # it for the next step is a thinning of those departures, a station's arrivals are the
+        # rate weighted mix of the flows that come in
+        previous_station = self.flow_station[np.maximum(self.flow_previous, 0)]
+        share = np.where(self.flow_previous >= 0, self.flow_rate / self.arrival_rate[previous_station], 0)
+        arrival_scv = np.bincount(self.flow_station, weights=self.flow_rate * self.release_scv,
+                                  minlength=len(servers)) / self.arrival_rate
+        for _ in range(MAX_ITERATIONS):
+            departure_scv = (1 + (1 - rho ** 2) * (arrival_scv - 1)
+                             + rho ** 2 * (self.service_scv - 1) / np.sqrt(np.maximum(servers, 1)))
+            flow_scv = np.where(self.flow_previous >= 0, share * departure_scv[previous_station] + 1 - share,
+                                self.release_scv)
+            updated = np.bincount(self.flow_station, weights=self.flow_rate * flow_scv,
+                                  minlength=len(servers)) / self.arrival_rate
+            if np.max(np.abs(updated - arrival_scv)) < 1e-9:
+                arrival_scv = updated
+                break
+            arrival_scv = updated
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mmc_wait = erlang_c(servers, self.load) * self.service_time / (servers * (1 - utilization))
+        waiting = np.where(stable, (arrival_scv + self.service_scv) / 2 * mmc_wait, np.inf)
+        flow_time = waiting[self.flow_station] + self.flow_service
+        return {"servers": servers, "utilization": utilization, "arrival_scv": arrival_scv,
+                "waiting_hours": waiting, "flow_hours": flow_time}
+
+    def lead_time_hours(self, machine_quantity):
+        # working hours from release to the end of the route per part, a single number per part is
+        # what a machine count search needs
+        flow_time = self.evaluate(machine_quantity)["flow_hours"]
+        lead = np.zeros(len(self.ordered_part.part_id))
+        np.add.at(lead, self.flow_part, flow_time)
+        return lead
+
+    def order_lead_time_hours(self, machine_quantity):
+        # per part its own route after the slowest chain of sub-parts below it, the assembly step
+        # waits until every sub-part is there
+        total = self.lead_time_hours(machine_quantity)
+        for i in self.bom.order[::-1]:
+            children, _ = self.bom.sub_parts(i)
+            if len(children):
+                total[i] += total[children].max()
+        return total
+
+    def mean_lead_time_hours(self, machine_quantity):
+        # over the orders placed on every part, sub-parts included in the lead time of their parent
+        lead = self.order_lead_time_hours(machine_quantity)
+        orders = np.asarray(self.ordered_part.orders.number_of_orders, dtype=np.float64)
+        return float(np.average(lead[orders > 0], weights=orders[orders > 0]))
+
+    def report(self, machine_quantity):
+        # (per machine type, per route) DataFrames; work in process from Little's law, in batches
+        # and pieces, lead times in working hours and working days
+        result = self.evaluate(machine_quantity)
+        n = len(self.machine_id)
+        wip_batches = np.bincount(self.flow_station, weights=self.flow_rate * result["flow_hours"], minlength=n)
+        wip_pieces = np.bincount(self.flow_station,
+                                 weights=self.flow_rate * self.flow_pieces * result["flow_hours"], minlength=n)
+        stations = pd.DataFrame({
+            "servers": result["servers"],
+            "batches_per_hour": self.arrival_rate,
+            "service_hours": self.service_time,
+            "utilization": result["utilization"],
+            "arrival_scv": result["arrival_scv"],
+            "service_scv": self.service_scv,
+            "waiting_hours": result["waiting_hours"],
+            "wip_batches": wip_batches,
+            "wip_pieces": wip_pieces,
+        }, index=pd.Index(self.machine_id, name="machine_type"))
+
+        route_number = np.asarray(self.ordered_part.route_number)
+        lead = np.zeros(len(self.ordered_part.part_id))
+        waiting = np.zeros(len(self.ordered_part.part_id))
+        np.add.at(lead, self.flow_part, result["flow_hours"])
+        np.add.at(waiting, self.flow_part, result["waiting_hours"][self.flow_station])
+        first = self.flow_previous < 0
+        parts, rate = self.flow_part[first], self.flow_rate[first]
+        routes = pd.DataFrame({"route_number": route_number[parts], "rate": rate,
+                               "lead": lead[parts] * rate, "waiting": waiting[parts] * rate})
+        routes = routes.groupby("route_number").sum()
+        catalog = self.ordered_part.route_catalog
+        routes = pd.DataFrame({
+            "route": [" > ".join(catalog.routes[r]) for r in routes.index],
+            "batches_per_hour": routes["rate"],
+            "waiting_hours": routes["waiting"] / routes["rate"],
+            "lead_time_hours": routes["lead"] / routes["rate"],
+            "lead_time_days": routes["lead"] / routes["rate"] / self.hours_per_day,
+        }, index=routes.index)
+        return stations, routes
+
+
+if __name__ == "__main__":
+    import time
+    from make_json_ordered_parts import load_ordered_parts
+    from OEE import Available_machines
+
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    available_machines = Available_machines(days[0], days[-1])
+    model = QueueingModel(ordered_part, days)
+    stations, routes = model.report(available_machines.new_machine_quantity)
+    print(stations.to_string())
+    print(routes.to_string())
+    print("more work than machine time on average:", list(stations.index[stations["utilization"] >= 1]))
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        model.mean_lead_time_hours(available_machines.new_machine_quantity)
+    print(f"{(time.perf_counter() - start):.3f} ms per evaluation")
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+FIGURE_DIR = "../figures"
+# per output directory, the data hash of every chart that was rendered there
+HASH_FILE = ".render_hashes.json"
+# a worker process is replaced after this many charts, so a long report does not keep growing
+TASKS_PER_WORKER = 20
+
+
+def route_load_series(planning, j):
+    # everything plot_route_load needs of one route of get_daily_data.Planning, small enough
+    # to send to a worker
+    steps = len(planning.route[j])
+    labels = []
+    for k, machine in enumerate(planning.route[j]):
+        label = f"step {k+1}: {machine}"
+        if planning.machine_quantity is not None:
+            label += f"({planning.machine_quantity[j][k]:.2g}x)"
+        labels.append(label)
+    return {
+        "day": np.asarray(planning.day, dtype="datetime64[D]"),
+        "hours": np.asarray(planning.route_time[:, j, :steps]),
+        "capacity": None if planning.capacity is None else np.asarray(planning.capacity[:, j, :steps]),
+        "labels": labels,
+        "title": f"Production line {j}",
+    }
+
+
+def bar_series(x_values, y_values, colors, x_label, y_label, title):
+    return {"x": list(x_values), "y": list(y_values), "colors": list(colors),
+            "x_label": x_label, "y_label": y_label, "title": title}
+
+
+def sankey_series(route_catalog, title="All Production Routes", font_size=14):
+    # one Sankey per route of Classes_setup.RouteCatalog, every route a chain of machines
+    # ending in "Done" with the machine hours of all its parts per step
+    return {"routes": [list(route) + ["Done"] for route in route_catalog.routes],
+            "totals": [route_catalog.step_total(r).tolist() + [0] for r in range(len(route_catalog))],
+            "color_map": route_catalog.machine_color_map(extra=["Done"]), "title": title, "font_size": font_size}
+
+
+def draw_route_load(series, path):
+    fig = plt.figure()
+    day = series["day"].astype(object)
+    for k, label in enumerate(series["labels"]):
+        y = series["hours"][:, k]
+        line, = plt.plot(day, y, label=label)
+        plt.axhline(np.mean(y), linestyle="--", color=line.get_color(), label="_nolegend_")
+        if series["capacity"] is not None:
+            plt.plot(day, series["capacity"][:, k], linestyle=":", color=line.get_color(),
+                     label="available hours per machine" if k == 0 else "_nolegend_")
+    if series["capacity"] is None:
+        plt.axhline(16, linestyle="-", color="k", label="hours in a day")
+    plt.xlabel("Day")
+    plt.ylabel("Total machine time per day [h]")
+    plt.title(series["title"])
+    plt.legend(loc="upper right")
+    plt.ylim(0, 40)
+    plt.xlim(day[0], day[-1])
+    plt.xticks(rotation=45)
+    plt.savefig(path)
+    plt.close(fig)
+
+
+def draw_bar(series, path):
+    fig = plt.figure()
+    plt.bar(series["x"], series["y"], color=series["colors"])
+    plt.xlabel(series["x_label"])
+    plt.ylabel(series["y_label"])
+    plt.title(series["title"])
+    plt.xticks(rotation=90)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close(fig)
+
+
+def draw_sankey(series, path):
+    # a html page, plotly needs kaleido for images and that is not in requirements.txt
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    n_routes = len(series["routes"])
+    rows = (n_routes + 2) // 2  # 2 columns per row
+    cols = min(2, n_routes)
+    fig = make_subplots(
+        rows=rows,
+        cols=cols,
+        specs=[[{"type": "domain"}]*cols for _ in range(rows)],
+        subplot_titles=[f"Route {i}" for i in range(n_routes)]
+    )
+    for i, (route, values) in enumerate(zip(series["routes"], series["totals"])):
+        n = len(route)
+        sankey = go.Sankey(
+            node=dict(
+                pad=15,
+                thickness=20,
+                line=dict(color="black", width=0.5),
+                label=[f"{m}<br>{values[j]:.1f} h" for j, m in enumerate(route)],
+                color=[series["color_map"][m] for m in route]
+            ),
+            link=dict(
+                source=list(range(n-1)),
+                target=list(range(1, n)),
+                value=values,
+                customdata=values
+            )
+        )
+        fig.add_trace(sankey, row=i // 2 + 1, col=i % 2 + 1)
+    fig.update_layout(height=rows*400, width=2000, title_text=series["title"], font_size=series["font_size"])
+    fig.write_html(path, include_plotlyjs="cdn")
+
+
+DRAW = {"route_load": draw_route_load, "bar": draw_bar, "sankey": draw_sankey}
+
+
+def data_hash(kind, series):
+    return hashlib.sha1(pickle.dumps((kind, series), protocol=4)).hexdigest()
+
+
+def render_job(job):
+    kind, series, path = job
+    DRAW[kind](series, path)
+    return path
+
+
+def read_hashes(directory):
+    try:
+        with open(os.path.join(directory, HASH_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_hashes(directory, hashes):
+    with open(os.path.join(directory, HASH_FILE), "w") as f:
+        json.dump(hashes, f, indent=1, sort_keys=True)
+
+
+def render_all(jobs, workers=None, force=False):
+    # jobs are (kind, series, path) with kind a key of DRAW; charts whose file exists and whose
+    # series hash the same as at the last run are skipped, the rest are drawn headless in a
+    # process pool; returns the paths that were drawn and the ones that were skipped
+    hashes = {}
+    todo, skipped = [], []
+    for kind, series, path in jobs:
+        directory = os.path.dirname(path) or "."
+        if directory not in hashes:
+            os.makedirs(directory, exist_ok=True)
+            hashes[directory] = read_hashes(directory)
+        key = data_hash(kind, series)
+        name = os.path.basename(path)
+        if not force and hashes[directory].get(name) == key and os.path.exists(path):
+            skipped.append(path)
+        else:
+            todo.append((kind, series, path, key))
+
+    rendered = []
+    if workers == 1 or len(todo) <= 1:
+        for kind, series, path, key in todo:
+            rendered.append(render_job((kind, series, path)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=TASKS_PER_WORKER) as pool:
+            futures = [pool.submit(render_job, (kind, series, path)) for kind, series, path, _ in todo]
+            rendered = [future.result() for future in as_completed(futures)]
+
+    # only charts that were drawn get their new hash, a failed chart raises above and is retried next run
+    for kind, series, path, key in todo:
+        hashes[os.path.dirname(path) or "."][os.path.basename(path)] = key
+    for directory, directory_hashes in hashes.items():
+        write_hashes(directory, directory_hashes)
+    return rendered, skipped
@@ -0,0 +1,106 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from simulation import FIRST_SHIFT_START, HOURS_PER_SHIFT, ShopFloorSimulation, own_orders
+
+
+def total_tardiness(result):
+    return float(result.orders["tardiness_hours"].sum())
+
+
+def dispatch_plan(result):
+    # per machine, per shift sequence of the batches in result.operations with real timestamps
+    operations = result.operations.sort_values(["machine_type", "machine", "start"]).reset_index(drop=True)
+    start_hour = operations["start"].to_numpy()
+    day = (start_hour // 24).astype(np.int64)
+    shift = ((start_hour - day * 24 - FIRST_SHIFT_START) // HOURS_PER_SHIFT).astype(np.int64)
+    orders = result.orders
+
+    def timestamp(hours):
+        return result.start_date + (np.asarray(hours) * 3600).astype("timedelta64[s]")
+
+    plan = pd.DataFrame({
+        "machine_type": operations["machine_type"],
+        "machine": operations["machine"],
+        "date": result.start_date + day,
+        "shift": shift + 1,
+        "start": timestamp(operations["start"]),
+        "end": timestamp(operations["end"]),
+        "order_number": orders["order_number"].to_numpy()[operations["order"]],
+        "ordered_part": orders["part_id"].to_numpy()[operations["order"]],
+        "part": np.asarray(result.part_id)[operations["part"]],
+        "step": operations["step"] + 1,
+        "pieces": operations["pieces"],
+        "setup_time": operations["setup_time"],
+    })
+    plan["sequence"] = plan.groupby(["machine_type", "machine", "date", "shift"]).cumcount() + 1
+    return plan
+
+
+def improve(simulation, result, seconds, orders=None, seed=0, window=10):
+    # local search on a priority rank per order, starting from the completion order of result:
+    # a late order swaps ranks with one of the `window` orders just ahead of it and the swap is
+    # kept when the total tardiness goes down, until `seconds` have passed
+    rng = np.random.default_rng(seed)
+    deadline = time.perf_counter() + seconds
+    completion = result.orders["completion"].to_numpy()
+    rank = np.empty(len(completion), dtype=np.int64)
+    rank[np.argsort(completion, kind="stable")] = np.arange(len(completion))
+
+    best, best_rank = result, None
+    candidate = simulation.run(orders, rank=rank)
+    if total_tardiness(candidate) < total_tardiness(best):
+        best, best_rank = candidate, rank.copy()
+    current, current_score = rank, total_tardiness(candidate)
+
+    while time.perf_counter() < deadline:
+        # a late order that is already first has no order ahead of it to swap with
+        late = np.flatnonzero(candidate.orders["late"].to_numpy() & (current > 0))
+        if len(late) == 0:
+            break
+        k = late[rng.integers(len(late))]
+        ahead = current[k] - rng.integers(1, min(window, current[k]) + 1)
+        j = int(np.flatnonzero(current == ahead)[0])
+        trial = current.copy()
+        trial[k], trial[j] = trial[j], trial[k]
+        trial_result = simulation.run(orders, rank=trial)
+        score = total_tardiness(trial_result)
+        if score < current_score:
+            current, current_score, candidate = trial, score, trial_result
+            if score < total_tardiness(best):
+                best, best_rank = trial_result, trial.copy()
+
+    if best_rank is not None:
+        best = simulation.run(orders, rank=best_rank, record=True)
+    return best
+
+
+def schedule(ordered_part, machine_quantity, rule="atc", improve_seconds=0.0, orders=None, seed=0):
+    # finite capacity list schedule with the dispatch rule, optionally improved by local search
+    # for improve_seconds; returns the dispatch plan and the simulation result behind it
+    orders = own_orders(ordered_part) if orders is None else orders
+    simulation = ShopFloorSimulation(ordered_part, machine_quantity, dispatch=rule)
+    result = simulation.run(orders, record=True)
+    if improve_seconds > 0:
+        result = improve(simulation, result, improve_seconds, orders, seed)
+    return dispatch_plan(result), result
+
+
+if __name__ == "__main__":
+    from make_json_ordered_parts import load_ordered_parts
+    from daily_demand import planning_days
+    from OEE import Available_machines
+
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    available_machines = Available_machines(days[0], days[-1])
+
+    for rule in ["edd", "atc"]:
+        plan, result = schedule(ordered_part, available_machines.new_machine_quantity, rule)
+        print(rule, "late orders:", int(result.orders["late"].sum()), "tardiness (h):", total_tardiness(result))
+    plan, result = schedule(ordered_part, available_machines.new_machine_quantity, "atc", improve_seconds=10)
+    print("atc + local search", "late orders:", int(result.orders["late"].sum()),
+          "tardiness (h):", total_tardiness(result))
+    print(plan.head(20).to_string(index=False))
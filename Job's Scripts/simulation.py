@@ -0,0 +1,419 @@
+import bisect
+import heapq
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from bom import BomGraph
+from daily_demand import planning_days
+
+MAINTENANCE_PATH = "../data/Maintenance.csv"
+SHIFTS = 2
+HOURS_PER_SHIFT = 8
+# hour of the day the first shift starts, the second one follows right after it
+FIRST_SHIFT_START = 6
+# operating hours between preventive maintenance, used when the footnotes can not be read
+MINOR_PM_AFTER = 1300
+MAJOR_PM_AFTER = 3900
+# look-ahead of the apparent tardiness cost rule on the slack and on the setup time
+ATC_K1 = 4.0
+ATC_K2 = 1.0
+# the atc rule only looks at this many batches with the earliest due dates, so a long queue stays cheap
+ATC_CANDIDATES = 128
+
+
+def read_maintenance(path=MAINTENANCE_PATH):
+    # machine rows only, the footnotes below the table are read by read_pm_intervals
+    df = pd.read_csv(path)
+    df = df.dropna(subset=["Machine code"]).set_index("Machine code")
+    df = df.iloc[:, 1:4].astype(float)
+    df.columns = ["minor_pm_time", "major_pm_time", "cit_per_shift"]
+    return df
+
+
+def read_pm_intervals(path=MAINTENANCE_PATH):
+    # (minor, major) operating hours between preventive maintenance from the footnotes
+    raw = pd.read_csv(path, header=None, dtype=str).fillna("")
+    return pm_intervals_from_rows(raw.itertuples(index=False))
+
+
+def pm_intervals_from_rows(rows):
+    # rows of text cells of the maintenance sheet, the number after the footnote text is the interval
+    intervals = {"minor": MINOR_PM_AFTER, "major": MAJOR_PM_AFTER}
+    for row in rows:
+        text = " ".join(row)
+        for kind in intervals:
+            if re.search(kind + r" Preventive Maintenance after", text, re.IGNORECASE):
+                numbers = [cell for cell in row if re.fullmatch(r"\d+(\.\d+)?", cell.strip())]
+                if numbers:
+                    intervals[kind] = float(numbers[0])
+    return intervals["minor"], intervals["major"]
+
+
+class ShiftCalendar:
+    # working windows of one machine type in hours since midnight, cleaning and inspection
+    # time is taken half at the start (inspection) and half at the end (cleaning) of a shift
+    __slots__ = ("windows",)
+
+    def __init__(self, cit_per_shift=0.0):
+        half = cit_per_shift / 2
+        self.windows = [(FIRST_SHIFT_START + s * HOURS_PER_SHIFT + half,
+                         FIRST_SHIFT_START + (s + 1) * HOURS_PER_SHIFT - half) for s in range(SHIFTS)]
+
+    def _locate(self, t):
+        # (day, window, moment) of the first moment at or after t the machine can work
+        day = int(t // 24)
+        while True:
+            offset = t - day * 24
+            for k, (start, end) in enumerate(self.windows):
+                if offset < end:
+                    return day, k, day * 24 + max(offset, start)
+            day += 1
+            t = day * 24
+
+    def next_working(self, t):
+        return self._locate(t)[2]
+
+    def advance(self, t, hours):
+        # the moment `hours` of work that starts at t is done, paused outside the shifts
+        day, k, t = self._locate(t)
+        while True:
+            end = day * 24 + self.windows[k][1]
+            if t + hours <= end:
+                return t + hours
+            hours -= end - t
+            k += 1
+            if k == len(self.windows):
+                k = 0
+                day += 1
+            t = day * 24 + self.windows[k][0]
+
+
+class Job:
+    # the pieces of one part needed for one order, parent is the job it is assembled into
+    __slots__ = ("order", "part", "pieces", "parent", "open_children", "open_batches", "waiting", "due",
+                 "done_time")
+
+    def __init__(self, order, part, pieces, parent, due):
+        self.order = order
+        self.part = part
+        self.pieces = pieces
+        self.parent = parent
+        self.open_children = 0
+        self.open_batches = 0
+        self.waiting = []
+        self.due = due
+        self.done_time = None
+
+
+class Batch:
+    # one transport batch of a job, moves through the route of its part step by step
+    __slots__ = ("job", "pieces", "step")
+
+    def __init__(self, job, pieces):
+        self.job = job
+        self.pieces = pieces
+        self.step = 0
+
+
+class MachineState:
+    __slots__ = ("machine_type", "number", "calendar", "pm_time", "last_part", "operating_hours",
+                 "hours_since_pm", "next_major", "busy_hours", "pm_hours")
+
+    def __init__(self, machine_type, number, calendar, pm_time, major_pm_after):
+        # pm_time is (minor, major) hours, None for machines without preventive maintenance
+        self.machine_type = machine_type
+        self.number = number
+        self.calendar = calendar
+        self.pm_time = pm_time
+        self.last_part = None
+        self.operating_hours = 0.0
+        self.hours_since_pm = 0.0
+        self.next_major = major_pm_after
+        self.busy_hours = 0.0
+        self.pm_hours = 0.0
+
+
+def own_orders(ordered_part):
+    # the order pattern rows, without the orders sub-parts inherit from their parents
+    table = ordered_part.orders.table
+    own = table.part == table.source_part
+    quantity = np.array([q for quantities in ordered_part.orders.quantity for q in quantities], dtype=np.int64)
+    return pd.DataFrame({
+        "order_number": table.order_number[own],
+        "part": table.part[own],
+        "quantity": quantity,
+        "order_date": table.order_date[own],
+        "delivery_date": table.delivery_date[own],
+    })
+
+
+ARRIVE, FINISH = 0, 1
+DISPATCH_RULES = ("edd", "fifo", "atc")
+
+
+class ShopFloorSimulation:
+    # pushes the orders through the routes on a fixed number of machines per type; a batch
+    # needs a setup when the machine worked on another part before, waits idle_time before the
+    # next step and an assembly step waits until every sub-part job of the order is done;
+    # a free machine takes the batch with the earliest due date (edd), the one that arrived
+    # first (fifo) or the highest apparent tardiness cost with setups (atc)
+    def __init__(self, ordered_part, machine_quantity, maintenance=None, pm_intervals=None, dispatch="edd"):
+        self.ordered_part = ordered_part
+        self.bom = BomGraph.from_ordered_part(ordered_part)
+        self.machine_quantity = dict(machine_quantity)
+        self.maintenance = read_maintenance() if maintenance is None else maintenance
+        self.minor_pm_after, self.major_pm_after = read_pm_intervals() if pm_intervals is None else pm_intervals
+        if dispatch not in DISPATCH_RULES:
+            raise ValueError(f"unknown dispatch rule {dispatch!r}, use one of {DISPATCH_RULES}")
+        self.dispatch = dispatch
+
+        missing = {str(m) for m in ordered_part.operations.route} - set(self.machine_quantity)
+        if missing:
+            raise ValueError(f"no machine quantity for machine types {sorted(missing)}")
+
+    def _machine(self, machine_type, number):
+        if machine_type not in self.maintenance.index:
+            return MachineState(machine_type, number, ShiftCalendar(), None, self.major_pm_after)
+        row = self.maintenance.loc[machine_type]
+        return MachineState(machine_type, number, ShiftCalendar(row["cit_per_shift"]),
+                            (row["minor_pm_time"], row["major_pm_time"]), self.major_pm_after)
+
+    def _make_jobs(self, order, part, pieces, parent, due):
+        job = Job(order, part, pieces, parent, due)
+        jobs = [job]
+        children, quantities = self.bom.sub_parts(part)
+        for child, quantity in zip(children, quantities):
+            job.open_children += 1
+            jobs += self._make_jobs(order, int(child), int(round(pieces * quantity)), job, due)
+        return jobs
+
+    def run(self, orders=None, start_date=None, rank=None, record=False):
+        # rank (one number per order, lowest first) replaces the dispatch rule, record keeps
+        # every operation in result.operations
+        ordered_part = self.ordered_part
+        orders = own_orders(ordered_part) if orders is None else orders
+        start_date = planning_days(ordered_part)[0] if start_date is None else np.datetime64(start_date, "D")
+        route = [[str(m) for m in r] for r in ordered_part.route]
+        setup_time = [r.tolist() for r in ordered_part.setup_time]
+        process_time = [r.tolist() for r in ordered_part.process_time]
+        idle_time = [r.tolist() for r in ordered_part.idle_time]
+        batch_size = [int(b) if b > 0 else 1 for b in ordered_part.max_transport_batch]
+        # process time per piece of the steps still to go, for the slack of the atc rule
+        remaining_time = [np.cumsum(r[::-1])[::-1].tolist() for r in process_time]
+        atc = rank is None and self.dispatch == "atc"
+
+        machines = {m: [self._machine(m, n) for n in range(int(count))]
+                    for m, count in self.machine_quantity.items()}
+        free = {m: list(states) for m, states in machines.items()}
+        queues = {m: [] for m in machines}
+        events = []
+        sequence = 0
+
+        # released the day after the order date like the planning, due at the end of the delivery date
+        release = (orders["order_date"].to_numpy().astype("datetime64[D]") - start_date).astype(np.int64) * 24 + 24
+        due = (orders["delivery_date"].to_numpy().astype("datetime64[D]") - start_date).astype(np.int64) * 24 + 24
+        top_jobs = []
+        for k, (part, pieces) in enumerate(zip(orders["part"].to_numpy(), orders["quantity"].to_numpy())):
+            jobs = self._make_jobs(k, int(part), int(pieces), None, float(due[k]))
+            top_jobs.append(jobs[0])
+            for job in jobs:
+                size = batch_size[job.part]
+                for first in range(0, job.pieces, size):
+                    job.open_batches += 1
+                    heapq.heappush(events, (float(release[k]), sequence, ARRIVE, Batch(job, min(size, job.pieces - first))))
+                    sequence += 1
+            # a job without pieces has nothing to make and is done at its release, sub-parts
+            # come after their parent in jobs so they are counted off before it
+            for job in reversed(jobs):
+                if job.open_batches == 0 and job.open_children == 0:
+                    job.done_time = float(release[k])
+                    if job.parent is not None:
+                        job.parent.open_children -= 1
+
+        wip_time, wip = [], []
+        in_system = 0
+        operations = []
+
+        def start(machine, batch, t):
+            nonlocal sequence
+            job = batch.job
+            part, step = job.part, batch.step
+            if machine.pm_time is not None and machine.hours_since_pm >= self.minor_pm_after:
+                major = machine.operating_hours >= machine.next_major
+                if major:
+                    machine.next_major += self.major_pm_after
+                pm_time = machine.pm_time[major]
+                t = machine.calendar.advance(t, pm_time)
+                machine.pm_hours += pm_time
+                machine.hours_since_pm = 0.0
+            run_time = batch.pieces * process_time[part][step]
+            setup = setup_time[part][step] if machine.last_part != part else 0.0
+            work = run_time + setup
+            machine.last_part = part
+            machine.operating_hours += run_time
+            machine.hours_since_pm += run_time
+            machine.busy_hours += work
+            end = machine.calendar.advance(t, work)
+            if record:
+                operations.append((machine.machine_type, machine.number, machine.calendar.next_working(t), end,
+                                   job.order, part, step, batch.pieces, setup))
+            heapq.heappush(events, (end, sequence, FINISH, (machine, batch)))
+            sequence += 1
+
+        def queue_key(batch, t):
+            if rank is not None:
+                return rank[batch.job.order]
+            return batch.job.due if self.dispatch == "edd" else t
+
+        def pick_atc(queue, machine, t):
+            # index of the batch with the highest apparent tardiness cost with setups on this machine
+            candidates = [b for _, _, b in queue[:ATC_CANDIDATES]]
+            run_time = [b.pieces * process_time[b.job.part][b.step] for b in candidates]
+            setup = [0.0 if machine.last_part == b.job.part else setup_time[b.job.part][b.step] for b in candidates]
+            mean_run_time = max(sum(run_time) / len(candidates), 1e-9)
+            mean_setup = sum(setup) / len(candidates)
+            best, best_index = -1.0, 0
+            for i, b in enumerate(candidates):
+                slack = max(b.job.due - t - b.pieces * remaining_time[b.job.part][b.step], 0.0)
+                index = math.exp(-slack / (ATC_K1 * mean_run_time)) / max(run_time[i] + setup[i], 1e-9)
+                if mean_setup > 0:
+                    index *= math.exp(-setup[i] / (ATC_K2 * mean_setup))
+                if index > best:
+                    best, best_index = index, i
+            return best_index
+
+        while events:
+            t, _, kind, payload = heapq.heappop(events)
+            if kind == ARRIVE:
+                batch = payload
+                job = batch.job
+                if batch.step == 0:
+                    in_system += 1
+                    wip_time.append(t)
+                    wip.append(in_system)
+                machine_type = route[job.part][batch.step]
+                if machine_type == "A" and job.open_children:
+                    job.waiting.append(batch)
+                    continue
+                if atc:
+                    # kept sorted on due date, pick_atc looks at the front of it
+                    bisect.insort(queues[machine_type], (batch.job.due, sequence, batch))
+                    sequence += 1
+                else:
+                    heapq.heappush(queues[machine_type], (queue_key(batch, t), sequence, batch))
+                    sequence += 1
+            else:
+                machine, batch = payload
+                machine_type = machine.machine_type
+                free[machine_type].append(machine)
+                job = batch.job
+                if batch.step + 1 < len(route[job.part]):
+                    heapq.heappush(events, (t + idle_time[job.part][batch.step], sequence, ARRIVE, batch))
+                    sequence += 1
+                    batch.step += 1
+                else:
+                    in_system -= 1
+                    wip_time.append(t)
+                    wip.append(in_system)
+                    job.open_batches -= 1
+                    if job.open_batches == 0:
+                        job.done_time = t
+                        parent = job.parent
+                        if parent is not None:
+                            parent.open_children -= 1
+                            if parent.open_children == 0:
+                                for waiting in parent.waiting:
+                                    heapq.heappush(events, (t, sequence, ARRIVE, waiting))
+                                    sequence += 1
+                                parent.waiting = []
+
+            queue = queues[machine_type]
+            while queue and free[machine_type]:
+                machine = free[machine_type].pop()
+                if atc:
+                    batch = queue.pop(pick_atc(queue, machine, t))[2]
+                else:
+                    _, _, batch = heapq.heappop(queue)
+                start(machine, batch, t)
+
+        return SimulationResult(ordered_part, orders, start_date, top_jobs, release, machines,
+                                np.array(wip_time), np.array(wip), operations if record else None)
+
+
+class SimulationResult:
+    def __init__(self, ordered_part, orders, start_date, top_jobs, release, machines, wip_time, wip,
+                 operations=None):
+        self.start_date = start_date
+        self.part_id = ordered_part.part_id
+        done = np.array([job.done_time for job in top_jobs], dtype=np.float64)
+        due = np.array([job.due for job in top_jobs], dtype=np.float64)
+
+        self.orders = orders.assign(
+            part_id=[ordered_part.part_id[p] for p in orders["part"]],
+            completion=start_date + (done * 3600).astype("timedelta64[s]"),
+            lead_time_days=(done - release + 24) / 24,
+            late=done > due,
+            tardiness_hours=np.maximum(done - due, 0),
+        )
+        # hours since the start date, one row per batch per routing step
+        self.operations = None
+        if operations is not None:
+            self.operations = pd.DataFrame(operations, columns=["machine_type", "machine", "start", "end", "order",
+                                                                "part", "step", "pieces", "setup_time"])
+        # an order that never finished has no completion and counts in no day; the horizon runs up
+        # to the day of the last completion, also when that is right at midnight
+        finished = np.isfinite(done)
+        horizon = int(done[finished].max() // 24) + 1 if finished.any() else 0
+        self.days = start_date + np.arange(horizon)
+
+        # pieces of ordered parts finished per day
+        self.throughput = pd.Series(
+            np.bincount((done[finished] // 24).astype(np.int64), weights=orders["quantity"].to_numpy()[finished],
+                        minlength=horizon),
+            index=self.days, name="pieces")
+        # transport batches between their first step and their last step, at the end of every day
+        at = np.searchsorted(wip_time, (np.arange(horizon) + 1) * 24, side="right") - 1
+        self.wip = pd.Series(np.where(at >= 0, wip[np.maximum(at, 0)], 0), index=self.days, name="batches")
+
+        rows = []
+        for machine_type, states in machines.items():
+            calendar = states[0].calendar if states else ShiftCalendar()
+            available = sum(end - start for start, end in calendar.windows) * horizon * len(states)
+            busy = sum(s.busy_hours for s in states)
+            rows.append({
+                "machine_type": machine_type,
+                "machines": len(states),
+                "busy_hours": busy,
+                "pm_hours": sum(s.pm_hours for s in states),
+                "available_hours": available,
+                "utilization": busy / available if available else np.nan,
+            })
+        self.machines = pd.DataFrame(rows).set_index("machine_type")
+
+    def summary(self):
+        return {
+            "orders": len(self.orders),
+            "late_orders": int(self.orders["late"].sum()),
+            "mean_lead_time_days": float(self.orders["lead_time_days"].mean()),
+            "max_lead_time_days": float(self.orders["lead_time_days"].max()),
+            "mean_wip_batches": float(self.wip.mean()),
+            "pieces_per_day": float(self.throughput.mean()),
+        }
+
+
+if __name__ == "__main__":
+    from make_json_ordered_parts import load_ordered_parts
+    from OEE import Available_machines
+
+    ordered_part = load_ordered_parts()
+    days = planning_days(ordered_part)
+    available_machines = Available_machines(days[0], days[-1])
+
+    result = ShopFloorSimulation(ordered_part, available_machines.new_machine_quantity).run()
+    for key, value in result.summary().items():
+        print(f"{key}: {value}")
+    print(result.machines)
+    print(result.orders[result.orders["late"]][["order_number", "part_id", "delivery_date", "completion"]])
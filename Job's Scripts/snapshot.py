@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from Classes_setup import *
+from workbook import content_hash
+
+SNAPSHOT_PATH = "../data/ordered_part_snapshot"
+SNAPSHOT_FORMAT = "ordered_part_snapshot"
+# bumped whenever the numbers or the layout of a build change, older snapshots are rebuilt
+SNAPSHOT_VERSION = 4
+
+# per part columns, one value per part
+PART_COLUMNS = ["part_id", "price", "max_transport_batch", "total_quantity", "total_time_all_parts",
+                "route_number", "is_main_assembly", "stock_size"]
+# list of lists per part, stored as values + offsets
+RAGGED_COLUMNS = ["sub_part_id", "quantity_of_sub_part", "total_sub_part_quantity"]
+ORDER_RAGGED_COLUMNS = ["quantity", "parent_part_id"]
+# list per part of lists, stored as values + offsets of the inner lists + part_offsets into those
+NESTED_ORDER_COLUMNS = ["parent_quantity"]
+
+
+def source_identity(source_paths):
+    # resolved path, size and content hash of every file a snapshot is built from
+    return [{"path": os.path.realpath(path), "size": os.path.getsize(path), "sha256": content_hash(path)}
+            for path in source_paths]
+
+
+def snapshot_dir(source_paths, root=SNAPSHOT_PATH):
+    # one snapshot directory under root per set of source files, named after their resolved paths,
+    # so a build from other files never takes the place of the default one
+    key = "\n".join(os.path.realpath(path) for path in source_paths)
+    return os.path.join(root, hashlib.sha1(key.encode()).hexdigest()[:16])
+
+
+def snapshot_matches(path, source_paths):
+    # the snapshot in path was built from exactly these files, as they are now
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return manifest.get("sources") == source_identity(source_paths)
+
+
+def write_snapshot(ordered_part, path=SNAPSHOT_PATH, source_paths=None):
+    # one .npy file per column plus a manifest, the manifest is written last so a
+    # half written snapshot is never picked up by read_snapshot; source_paths are the files
+    # the build came from, recorded so snapshot_matches can tell when they changed
+    ordered_part.compact()
+    os.makedirs(path, exist_ok=True)
+    columns = {}
+
+    def save(name, array):
+        array = np.asarray(array)
+        np.save(os.path.join(path, name + ".npy"), array, allow_pickle=False)
+        columns[name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+
+    for field in PART_COLUMNS:
+        values = getattr(ordered_part, field)
+        if field == "stock_size":
+            values = ["" if v is None else v for v in values]
+        save("part." + field, values)
+
+    for field in RAGGED_COLUMNS:
+        lists = getattr(ordered_part, field)
+        if field == "total_sub_part_quantity":
+            lists = [[np.nan if v is None else v for v in row] for row in lists]
+        ragged = Ragged.from_lists(lists, dtype=str if field == "sub_part_id" else np.float64)
+        save("part." + field + ".offsets", ragged.offsets)
+        save("part." + field, ragged.values)
+
+    operations = ordered_part.operations
+    save("operations.offsets", operations.offsets)
+    for field in OperationTable.fields:
+        save("operations." + field, getattr(operations, field))
+
+    table = ordered_part.orders.table
+    for field in OrderTable.__slots__:
+        save("orders." + field, getattr(table, field))
+    save("orders.number_of_orders", ordered_part.orders.number_of_orders)
+    for field in ORDER_RAGGED_COLUMNS:
+        ragged = Ragged.from_lists(getattr(ordered_part.orders, field),
+                                   dtype=str if field == "parent_part_id" else np.int64)
+        save("orders." + field + ".offsets", ragged.offsets)
+        save("orders." + field, ragged.values)
+    for field in NESTED_ORDER_COLUMNS:
+        lists = getattr(ordered_part.orders, field)
+        ragged = Ragged.from_lists([inner for row in lists for inner in row], dtype=np.int64)
+        part_offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in lists], out=part_offsets[1:])
+        save("orders." + field + ".part_offsets", part_offsets)
+        save("orders." + field + ".offsets", ragged.offsets)
+        save("orders." + field, ragged.values)
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "columns": columns,
+        "sources": None if source_paths is None else source_identity(source_paths),
+    }
+    with open(os.path.join(path, "manifest.json.tmp"), "w") as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(path, "manifest.json.tmp"), os.path.join(path, "manifest.json"))
+
+
+class Snapshot:
+    # opens the manifest only, columns are memory mapped the first time they are asked for
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not an ordered part snapshot")
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"snapshot version {self.manifest.get('version')} in {path}, "
+                             f"this code reads version {SNAPSHOT_VERSION}")
+        self._columns = {}
+
+    def columns(self):
+        return list(self.manifest["columns"])
+
+    def column(self, name):
+        if name not in self._columns:
+            if name not in self.manifest["columns"]:
+                raise KeyError(f"snapshot has no column {name!r}")
+            self._columns[name] = np.load(os.path.join(self.path, name + ".npy"), mmap_mode="r")
+        return self._columns[name]
+
+    def ragged(self, name):
+        return Ragged(self.column(name + ".offsets"), self.column(name))
+
+    def to_ordered_part(self):
+        ordered_part = OrderedPart()
+        for field in PART_COLUMNS:
+            setattr(ordered_part, field, self.column("part." + field))
+        ordered_part.part_id = ordered_part.part_id.tolist()
+        ordered_part.stock_size = [v or None for v in ordered_part.stock_size.tolist()]
+
+        ordered_part.sub_part_id = self.ragged("part.sub_part_id").tolist()
+        ordered_part.quantity_of_sub_part = self.ragged("part.quantity_of_sub_part").tolist()
+        ordered_part.total_sub_part_quantity = [
+            [None if np.isnan(v) else int(v) for v in row]
+            for row in self.ragged("part.total_sub_part_quantity").tolist()
+        ]
+
+        operations = OperationTable()
+        operations.offsets = self.column("operations.offsets")
+        for field in OperationTable.fields:
+            setattr(operations, field, self.column("operations." + field))
+
+        table = OrderTable()
+        for field in OrderTable.__slots__:
+            setattr(table, field, self.column("orders." + field))
+
+        orders = ordered_part.orders
+        orders.number_of_orders = self.column("orders.number_of_orders").tolist()
+        orders.quantity = self.ragged("orders.quantity").tolist()
+        orders.parent_part_id = self.ragged("orders.parent_part_id").tolist()
+        for field in NESTED_ORDER_COLUMNS:
+            inner = self.ragged("orders." + field).tolist()
+            offsets = self.column("orders." + field + ".part_offsets")
+            setattr(orders, field, [inner[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)])
+        return ordered_part.use_columns(operations, table)
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    return Snapshot(path).to_ordered_part()
+
@@ -0,0 +1,228 @@
+import math
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+QUALITY_PATH = "../data/Quality.csv"
+# used when the specification can not be read from the text above the table
+SPEC_TARGET = 600.0
+SPEC_TOLERANCE = 2.0
+
+# d2 and d3 per subgroup size 2..10, for the range chart
+D2 = dict(zip(range(2, 11), [1.128, 1.693, 2.059, 2.326, 2.534, 2.704, 2.847, 2.970, 3.078]))
+D3 = dict(zip(range(2, 11), [0.853, 0.888, 0.880, 0.864, 0.848, 0.833, 0.820, 0.808, 0.797]))
+WESTERN_ELECTRIC_RULES = ["beyond 3 sigma", "2 of 3 beyond 2 sigma", "4 of 5 beyond 1 sigma", "8 on one side"]
+
+
+def load_quality(path=QUALITY_PATH):
+    # the sheet starts with a description, the table starts at the row with the machine columns;
+    # returns the measurements and the (lower, upper) specification limits
+    raw = pd.read_csv(path, header=None, dtype=str).fillna("")
+    header_row = None
+    for i, row in enumerate(raw.itertuples(index=False)):
+        cells = [cell.strip() for cell in row]
+        if "Subgroup ID" in cells and any(cell.startswith("Machine ") for cell in cells):
+            header_row = i
+            break
+    if header_row is None:
+        raise ValueError(f"no table with 'Subgroup ID' and machine columns in {path}")
+
+    target, tolerance = SPEC_TARGET, SPEC_TOLERANCE
+    for cell in raw.iloc[:header_row].to_numpy().ravel():
+        match = re.search(r"(\d+(?:\.\d+)?)\s*(?:\+/-|±)\s*(\d+(?:\.\d+)?)", cell)
+        if match:
+            target, tolerance = float(match.group(1)), float(match.group(2))
+            break
+
+    df = raw.iloc[header_row + 1:].copy()
+    df.columns = [cell.strip() for cell in raw.iloc[header_row]]
+    df = df.apply(pd.to_numeric, errors="coerce").dropna(how="all")
+    df["Subgroup ID"] = df["Subgroup ID"].astype(np.int64)
+    return df.reset_index(drop=True), (target - tolerance, target + tolerance)
+
+
+def machine_columns(df):
+    return [column for column in df.columns if column.startswith("Machine ")]
+
+
+def subgroups(df, machine):
+    # (subgroup, measurement) array of one machine, every subgroup has to have the same size
+    ordered = df.sort_values("Subgroup ID", kind="stable")
+    sizes = ordered.groupby("Subgroup ID").size()
+    if sizes.nunique() != 1:
+        raise ValueError(f"subgroups of {machine} do not all have the same size: {sizes.unique().tolist()}")
+    return ordered[machine].to_numpy(dtype=np.float64).reshape(len(sizes), -1)
+
+
+def chart_constants(n):
+    # the usual control chart factors for subgroup size n
+    if n not in D2:
+        raise ValueError(f"subgroup size {n} is not supported, use 2 to 10 measurements per subgroup")
+    c4 = math.sqrt(2 / (n - 1)) * math.exp(math.lgamma(n / 2) - math.lgamma((n - 1) / 2))
+    spread = 3 * math.sqrt(1 - c4 ** 2) / c4
+    return {
+        "d2": D2[n], "c4": c4,
+        "A2": 3 / (D2[n] * math.sqrt(n)), "D3": max(0.0, 1 - 3 * D3[n] / D2[n]), "D4": 1 + 3 * D3[n] / D2[n],
+        "A3": 3 / (c4 * math.sqrt(n)), "B3": max(0.0, 1 - spread), "B4": 1 + spread,
+    }
+
+
+def subgroup_statistics(values):
+    # mean, range and standard deviation of every subgroup (row)
+    values = np.asarray(values, dtype=np.float64)
+    return values.mean(axis=1), np.ptp(values, axis=1), values.std(axis=1, ddof=1)
+
+
+def control_limits(mean_of_means, mean_spread, n, chart="xbar_r"):
+    # centre line and limits of the X-bar chart and of the R or S chart, works on arrays so
+    # the limits after every subgroup can be made at once from cumulative means
+    k = chart_constants(n)
+    if chart == "xbar_r":
+        width, sigma = k["A2"] * mean_spread, mean_spread / k["d2"]
+        spread_limits = (k["D3"] * mean_spread, k["D4"] * mean_spread)
+    elif chart == "xbar_s":
+        width, sigma = k["A3"] * mean_spread, mean_spread / k["c4"]
+        spread_limits = (k["B3"] * mean_spread, k["B4"] * mean_spread)
+    else:
+        raise ValueError(f"unknown chart {chart!r}, use 'xbar_r' or 'xbar_s'")
+    return {
+        "center": mean_of_means, "lcl": mean_of_means - width, "ucl": mean_of_means + width,
+        "spread_center": mean_spread, "spread_lcl": spread_limits[0], "spread_ucl": spread_limits[1],
+        # standard deviation of single measurements, for the capability
+        "sigma": sigma,
+    }
+
+
+def western_electric(z):
+    # (subgroup, rule) violations for subgroup means given as distance to the centre line in
+    # standard deviations of the mean; a rule fires on the subgroup that completes the pattern
+    z = np.asarray(z, dtype=np.float64)
+    violations = np.zeros((len(z), len(WESTERN_ELECTRIC_RULES)), dtype=bool)
+    violations[:, 0] = np.abs(z) > 3
+
+    def window_count(condition, width):
+        # number of true values in the window of `width` subgroups that ends at every subgroup
+        counts = np.cumsum(np.concatenate([[0], condition.astype(np.int64)]))
+        start = np.maximum(np.arange(1, len(condition) + 1) - width, 0)
+        return counts[1:] - counts[start]
+
+    for side in (1, -1):
+        violations[:, 1] |= window_count(side * z > 2, 3) >= 2
+        violations[:, 2] |= window_count(side * z > 1, 5) >= 4
+        violations[:, 3] |= window_count(side * z > 0, 8) >= 8
+    return violations
+
+
+def capability(values, lsl, usl, sigma=None):
+    # (Cp, Cpk), sigma defaults to the standard deviation of all measurements
+    values = np.asarray(values, dtype=np.float64)
+    mean = values.mean()
+    sigma = values.std(ddof=1) if sigma is None else sigma
+    return (usl - lsl) / (6 * sigma), min(usl - mean, mean - lsl) / (3 * sigma)
+
+
+def analyze(values, lsl, usl, chart="xbar_r"):
+    # phase I study of one machine: limits from every subgroup, rule checks against those limits
+    # and the capability with the within subgroup sigma of the chart
+    values = np.asarray(values, dtype=np.float64)
+    means, ranges, stds = subgroup_statistics(values)
+    spread = ranges if chart == "xbar_r" else stds
+    limits = control_limits(means.mean(), spread.mean(), values.shape[1], chart)
+    sigma_of_mean = (limits["ucl"] - limits["center"]) / 3
+    violations = western_electric((means - limits["center"]) / sigma_of_mean)
+    spread_out = (spread < limits["spread_lcl"]) | (spread > limits["spread_ucl"])
+    cp, cpk = capability(values, lsl, usl, limits["sigma"])
+    return {"limits": limits, "means": means, "spread": spread, "violations": violations,
+            "spread_out_of_control": spread_out, "cp": cp, "cpk": cpk}
+
+
+class ControlChart:
+    # X-bar R/S chart fed one subgroup at a time: running sums keep the limits up to date and the
+    # last eight z values are enough for the rules, so a subgroup costs the same at any history
+    # length; after freeze() the limits stay at what they were at that moment (phase II)
+    def __init__(self, subgroup_size, lsl=None, usl=None, chart="xbar_r"):
+        chart_constants(subgroup_size)
+        self.subgroup_size = subgroup_size
+        self.lsl, self.usl = lsl, usl
+        self.chart = chart
+        self.count = 0
+        self.sum_of_means = 0.0
+        self.sum_of_spread = 0.0
+        self.sum_of_values = 0.0
+        self.recent_z = deque(maxlen=8)
+        self.frozen_limits = None
+
+    def limits(self):
+        if self.frozen_limits is not None:
+            return self.frozen_limits
+        if self.count == 0:
+            return None
+        return control_limits(self.sum_of_means / self.count, self.sum_of_spread / self.count,
+                              self.subgroup_size, self.chart)
+
+    def freeze(self):
+        self.frozen_limits = self.limits()
+        return self
+
+    def add_subgroup(self, values):
+        # adds one subgroup, returns the names of the rules it breaks
+        return self.add_subgroups(np.asarray(values, dtype=np.float64)[None])[0]
+
+    def add_subgroups(self, values):
+        # adds (subgroup, measurement) values in one go, the limits of every subgroup are the
+        # running ones at that subgroup, so this gives the same as adding them one by one
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != self.subgroup_size:
+            raise ValueError(f"subgroups need {self.subgroup_size} measurements each, got shape {values.shape}")
+        means, ranges, stds = subgroup_statistics(values)
+        spread = ranges if self.chart == "xbar_r" else stds
+        if self.frozen_limits is not None:
+            limits = self.frozen_limits
+        else:
+            counts = self.count + np.arange(1, len(values) + 1)
+            limits = control_limits((self.sum_of_means + np.cumsum(means)) / counts,
+                                    (self.sum_of_spread + np.cumsum(spread)) / counts,
+                                    self.subgroup_size, self.chart)
+        sigma_of_mean = np.broadcast_to((limits["ucl"] - limits["center"]) / 3, means.shape)
+        z = np.divide(means - limits["center"], sigma_of_mean, out=np.zeros(len(means)), where=sigma_of_mean > 0)
+        violations = western_electric(np.concatenate([list(self.recent_z), z]))[len(self.recent_z):]
+        spread_out = (spread < limits["spread_lcl"]) | (spread > limits["spread_ucl"])
+
+        self.count += len(values)
+        self.sum_of_means += means.sum()
+        self.sum_of_spread += spread.sum()
+        self.sum_of_values += values.sum()
+        self.recent_z.extend(z.tolist())
+
+        broken = []
+        for hits, out in zip(violations, spread_out):
+            broken.append([rule for rule, hit in zip(WESTERN_ELECTRIC_RULES, hits) if hit]
+                          + (["spread out of control"] if out else []))
+        return broken
+
+    def capability(self):
+        # (Cp, Cpk) with the within subgroup sigma and the mean of everything added so far
+        if self.lsl is None or self.usl is None:
+            raise ValueError("capability needs the specification limits lsl and usl")
+        n = self.count * self.subgroup_size
+        mean = self.sum_of_values / n
+        sigma = self.limits()["sigma"]
+        return (self.usl - self.lsl) / (6 * sigma), min(self.usl - mean, mean - self.lsl) / (3 * sigma)
+
+
+if __name__ == "__main__":
+    df, (lsl, usl) = load_quality()
+    print(f"specification {lsl} - {usl}")
+    for machine in machine_columns(df):
+        result = analyze(subgroups(df, machine), lsl, usl)
+        limits = result["limits"]
+        print(f"{machine}: centre {limits['center']:.3f}, limits {limits['lcl']:.3f} - {limits['ucl']:.3f}, "
+              f"R centre {limits['spread_center']:.3f}, Cp {result['cp']:.2f}, Cpk {result['cpk']:.2f}")
+        for subgroup, hits in enumerate(result["violations"]):
+            broken = [rule for rule, hit in zip(WESTERN_ELECTRIC_RULES, hits) if hit]
+            if result["spread_out_of_control"][subgroup]:
+                broken.append("range out of control")
+            if broken:
+                print(f"    subgroup {subgroup + 1}: {', '.join(broken)}")
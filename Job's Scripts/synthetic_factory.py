@@ -0,0 +1,108 @@
+import os
+import numpy as np
+import pandas as pd
+
+MACHINES = ["SM", "TM", "MM", "MC", "DM", "GM", "CMM"]
+SECTORS = ["AU", "AI", "EN", "AGR"]
+PORTFOLIO_COLUMNS = ["Part number", "Serial number operation", "Machine routing", "Sub assy number",
+                     "Number of sub assy's", "Max transport batch size (pieces) ", "Setup time (h)",
+                     "Process time (h)", "Idle time (h)", "Price per part (€) ", "Size (indicative)"]
+
+
+def make_routes(rng, n_routes, route_length):
+    # a fixed set of routes the parts pick from, like the ~10 production lines in the real portfolio
+    low, high = route_length if isinstance(route_length, tuple) else (route_length, route_length)
+    routes = []
+    for _ in range(n_routes):
+        length = int(rng.integers(low, high + 1))
+        routes.append(rng.choice(MACHINES, size=length).tolist())
+    return routes
+
+
+def make_bom(rng, n_products, bom_depth, children_per_part):
+    # (part number, parent index or -1) in depth first order, so every part is listed
+    # before its sub-parts; part numbers follow the SECTOR-product-position pattern
+    width = max(3, len(str(n_products)))
+    parts = []
+    for product in range(1, n_products + 1):
+        sector = SECTORS[product % len(SECTORS)]
+        position = [0]
+
+        def add(parent, depth):
+            position[0] += 1
+            parts.append((f"{sector}-{product:0{width}d}-{position[0]:02d}", parent))
+            me = len(parts) - 1
+            if depth < bom_depth:
+                for _ in range(int(rng.integers(0, children_per_part + 1))):
+                    add(me, depth + 1)
+
+        add(-1, 1)
+    return parts
+
+
+def make_portfolio(n_products=40, bom_depth=2, route_length=(3, 8), n_routes=10, children_per_part=2, seed=0):
+    rng = np.random.default_rng(seed)
+    routes = make_routes(rng, n_routes, route_length)
+    parts = make_bom(rng, n_products, bom_depth, children_per_part)
+    children = [[] for _ in parts]
+    for i, (_, parent) in enumerate(parts):
+        if parent >= 0:
+            children[parent].append(i)
+
+    idle_per_machine = dict(zip(MACHINES + ["A"], rng.uniform(0.04, 0.14, len(MACHINES) + 1)))
+    rows = []
+    for i, (part_id, _) in enumerate(parts):
+        route = list(routes[rng.integers(len(routes))])
+        if children[i]:
+            route.append("A")
+        batch = float(rng.choice([10, 20, 30, 40]))
+        # one sub-part per row, parts without sub-parts get "Purch. items" on the last row
+        sub_parts = [(parts[c][0], float(rng.integers(1, 4))) for c in children[i]] or [("Purch. items", np.nan)]
+        n_rows = max(len(route), len(sub_parts))
+        for r in range(n_rows):
+            on_route = r < len(route)
+            sub_row = r - (n_rows - len(sub_parts))
+            rows.append({
+                "Part number": part_id if r == 0 else np.nan,
+                "Serial number operation": float(10 * (r + 1)) if on_route else np.nan,
+                "Machine routing": route[r] if on_route else np.nan,
+                "Sub assy number": sub_parts[sub_row][0] if sub_row >= 0 else np.nan,
+                "Number of sub assy's": sub_parts[sub_row][1] if sub_row >= 0 else np.nan,
+                "Max transport batch size (pieces) ": batch if on_route else np.nan,
+                "Setup time (h)": float(rng.uniform(0, 2)) if on_route else np.nan,
+                "Process time (h)": float(rng.uniform(0.1, 1.2)) if on_route else np.nan,
+                "Idle time (h)": idle_per_machine[route[r]] if on_route else np.nan,
+                "Price per part (€) ": float(rng.uniform(5, 400)) if r == 0 else np.nan,
+                "Size (indicative)": rng.choice(["Small", "Medium", "Large"]) if r == 0 else np.nan,
+            })
+    return pd.DataFrame(rows, columns=PORTFOLIO_COLUMNS)
+
+
+def make_order_pattern(portfolio, n_orders=200, horizon_days=140, lead_time=(14, 31), start_date="2025-07-14",
+                       seed=0):
+    # orders are placed on main assemblies only, like the real order pattern
+    rng = np.random.default_rng(seed + 1)
+    part_id = portfolio["Part number"].dropna()
+    main = part_id[part_id.str.endswith("-01")].to_numpy()
+    order_date = np.datetime64(start_date) + rng.integers(0, horizon_days, n_orders)
+    delivery_date = order_date + rng.integers(lead_time[0], lead_time[1] + 1, n_orders)
+    return pd.DataFrame({
+        "Order number": np.arange(1, n_orders + 1),
+        "Part number": rng.choice(main, n_orders),
+        "Number of parts": rng.integers(10, 101, n_orders),
+        "Order date": np.datetime_as_string(order_date),
+        "Desired delivery date": np.datetime_as_string(delivery_date),
+    })
+
+
+def write_factory(directory, n_products=40, bom_depth=2, route_length=(3, 8), n_orders=200, horizon_days=140,
+                  seed=0):
+    # writes "Product portfolio.csv" and "Order pattern.csv" into directory, returns both paths
+    os.makedirs(directory, exist_ok=True)
+    portfolio = make_portfolio(n_products, bom_depth, route_length, seed=seed)
+    orders = make_order_pattern(portfolio, n_orders, horizon_days, seed=seed)
+    portfolio_path = os.path.join(directory, "Product portfolio.csv")
+    orders_path = os.path.join(directory, "Order pattern.csv")
+    portfolio.to_csv(portfolio_path, index=False)
+    orders.to_csv(orders_path, index=False)
+    return portfolio_path, orders_path
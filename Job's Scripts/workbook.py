@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+WORKBOOK_PATH = "../data/Datasheet PSE 2026.xlsx"
+CACHE_PATH = "../data/workbook_cache"
+CACHE_FORMAT = "workbook_cache"
+
+# per sheet the columns of which a row needs at least one value to be part of the table, and the
+# columns that are read with their type; headers are matched without the spaces around them
+SCHEMAS = {
+    # extra sub assemblies of a part are on rows without a routing step
+    "Product portfolio": (["Machine routing", "Sub assy number"], [
+        ("Part number", "str"),
+        ("Serial number operation", "float"),
+        ("Machine routing", "str"),
+        ("Sub assy number", "str"),
+        ("Number of sub assy's", "float"),
+        ("Max transport batch size (pieces)", "float"),
+        ("Setup time (h)", "float"),
+        ("Process time (h)", "float"),
+        ("Idle time (h)", "float"),
+        ("Price per part (€)", "float"),
+        ("Size (indicative)", "str"),
+    ]),
+    "Order pattern": (["Order number"], [
+        ("Order number", "int"),
+        ("Part number", "str"),
+        ("Number of parts", "int"),
+        ("Order date", "date"),
+        ("Desired delivery date", "date"),
+    ]),
+    "Machine information": (["Machine code"], [
+        ("Machine code", "str"),
+        ("Machine", "str"),
+        ("Number of machines available", "float"),
+        ("Average scrap (%)", "float"),
+        ("Average rework (%)", "float"),
+        ("Startup defects (%)", "float"),
+        ("Purchase costs (€) (if new)", "float"),
+    ]),
+    "Maintenance": (["Machine code"], [
+        ("Machine code", "str"),
+        ("Machine", "str"),
+        ("Mean mPMTa,b (h)", "float"),
+        ("Mean MPMTc,d (h)", "float"),
+        ("Mean C&ITe per shift (h)", "float"),
+    ]),
+}
+
+# content hash per (path, modification time, size), so an untouched workbook is not read again
+_hashes = {}
+
+
+def content_hash(path=WORKBOOK_PATH):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+
+def schema_hash(sheet):
+    return hashlib.sha1(repr(SCHEMAS[sheet]).encode()).hexdigest()
+
+
+def clean_header(cell):
+    return str(cell).strip() if cell is not None else ""
+
+
+def typed_column(values, kind):
+    if kind == "str":
+        return pd.Series([None if v is None else str(v) for v in values], dtype=object)
+    if kind == "date":
+        return pd.to_datetime(pd.Series(values, dtype=object))
+    column = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    return column.astype(np.int64) if kind == "int" else column.astype(np.float64)
+
+
+def is_empty(cell):
+    return cell is None or (isinstance(cell, str) and not cell.strip())
+
+
+def parse_sheet(worksheet, sheet):
+    # streams the rows of a read only worksheet: the header row is the first row that has every
+    # column of the schema, below it only the schema columns are kept
+    keys, columns = SCHEMAS[sheet]
+    names = [name for name, _ in columns]
+    rows = worksheet.iter_rows(values_only=True)
+    position = None
+    for row in rows:
+        headers = [clean_header(cell) for cell in row]
+        if all(name in headers for name in names):
+            position = [headers.index(name) for name in names]
+            break
+    if position is None:
+        raise ValueError(f"sheet {sheet!r} has no header row with the columns {names}")
+
+    key_position = [position[names.index(key)] for key in keys]
+    width = max(position) + 1
+    values = [[] for _ in names]
+    for row in rows:
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        if all(is_empty(row[p]) for p in key_position):
+            continue
+        for column, p in zip(values, position):
+            column.append(row[p])
+    return pd.DataFrame({name: typed_column(column, kind) for (name, kind), column in zip(columns, values)})
+
+
+def read_manifest(cache_path):
+    try:
+        with open(os.path.join(cache_path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return manifest if manifest.get("format") == CACHE_FORMAT else None
+
+
+def read_sheets(sheets=None, path=WORKBOOK_PATH, cache_path=CACHE_PATH):
+    # {sheet: typed DataFrame} for the given sheets (all of SCHEMAS by default); sheets of a
+    # workbook with the same content as last time come from the cache, the rest are streamed
+    # from the workbook in one read only pass
+    sheets = list(SCHEMAS) if sheets is None else list(sheets)
+    workbook_hash = content_hash(path)
+    manifest = read_manifest(cache_path) if cache_path is not None else None
+    cached = {}
+    if manifest is not None and manifest["workbook"] == workbook_hash:
+        cached = manifest["sheets"]
+
+    frames = {}
+    for sheet in sheets:
+        if cached.get(sheet) == schema_hash(sheet):
+            frames[sheet] = pd.read_pickle(os.path.join(cache_path, sheet + ".pkl"))
+    missing = [sheet for sheet in sheets if sheet not in frames]
+    if not missing:
+        return frames
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in missing:
+            frames[sheet] = parse_sheet(workbook[sheet], sheet)
+    finally:
+        workbook.close()
+
+    if cache_path is not None:
+        # the manifest goes last, so a half written cache is never used
+        os.makedirs(cache_path, exist_ok=True)
+        for sheet in missing:
+            frames[sheet].to_pickle(os.path.join(cache_path, sheet + ".pkl"))
+            cached[sheet] = schema_hash(sheet)
+        manifest = {"format": CACHE_FORMAT, "workbook": workbook_hash, "sheets": cached}
+        with open(os.path.join(cache_path, "manifest.json.tmp"), "w") as f:
+            json.dump(manifest, f)
+        os.replace(os.path.join(cache_path, "manifest.json.tmp"), os.path.join(cache_path, "manifest.json"))
+    return frames
+
+
+def read_sheet(sheet, path=WORKBOOK_PATH, cache_path=CACHE_PATH):
+    return read_sheets([sheet], path, cache_path)[sheet]
+
+
+def machine_information(path=WORKBOOK_PATH, cache_path=CACHE_PATH):
+    # same layout as OEE.read_machine_information
+    return read_sheet("Machine information", path, cache_path).set_index("Machine code")
+
+
+def maintenance(path=WORKBOOK_PATH, cache_path=CACHE_PATH):
+    # same layout as simulation.read_maintenance
+    df = read_sheet("Maintenance", path, cache_path).set_index("Machine code")
+    df = df.iloc[:, 1:4]
+    df.columns = ["minor_pm_time", "major_pm_time", "cit_per_shift"]
+    return df
+
+
+def pm_intervals(path=WORKBOOK_PATH):
+    # (minor, major) operating hours between preventive maintenance, from the footnotes below the
+    # maintenance table, see simulation.read_pm_intervals
+    from simulation import pm_intervals_from_rows
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = [["" if cell is None else str(cell) for cell in row]
+                for row in workbook["Maintenance"].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+    return pm_intervals_from_rows(rows)
+
+
+if __name__ == "__main__":
+    import time
+
+    for sheet, df in read_sheets(cache_path=None).items():
+        print(sheet, df.shape)
+        print(df.dtypes.to_string())
+    start = time.perf_counter()
+    read_sheets()
+    print(f"read and cached in {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    read_sheets()
+    print(f"from the cache in {time.perf_counter() - start:.3f} s")
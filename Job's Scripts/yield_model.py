@@ -0,0 +1,79 @@
+import copy
+
+import numpy as np
+
+from Classes_setup import DemandIndex, Ragged
+from OEE import read_machine_information
+
+QUALITY_COLUMNS = ["Average scrap (%)", "Average rework (%)", "Startup defects (%)"]
+
+
+class YieldModel:
+    # scrap, rework and startup defects of "Machine information.csv" per routing step:
+    # scrap is compounded towards the end of the route (a step has to start enough pieces for
+    # the scrap of every step after it), rework is one more pass on the same step and the
+    # startup defects are the share of the first transport batch after a setup that is lost
+    def __init__(self, ordered_part, machine_information=None):
+        info = read_machine_information() if machine_information is None else machine_information
+        operations = ordered_part.operations
+        rates = info.reindex([str(m) for m in operations.route])[QUALITY_COLUMNS].astype(float).fillna(0)
+        self.offsets = operations.offsets
+        part = operations.part_of_operation()
+        # first routing step after the route of every step
+        self.route_end = operations.offsets[part + 1]
+        batch = np.asarray(ordered_part.max_transport_batch, dtype=np.float64)[part]
+        self.batch_hours = batch * operations.process_time
+        self.set_rates(*rates.to_numpy().T / 100)
+
+    def set_rates(self, scrap, rework, startup):
+        # rates per routing step, or (replication, routing step) arrays like monte_carlo draws them
+        self.scrap, self.rework, self.startup = scrap, rework, startup
+        # pieces a step has to start for one good piece at the end of the route
+        log_yield = np.log1p(-np.asarray(scrap))
+        n = log_yield.shape[-1]
+        cumulative = np.concatenate([np.zeros(log_yield.shape[:-1] + (1,)), np.cumsum(log_yield, axis=-1)], axis=-1)
+        self.quantity_factor = np.exp(cumulative[..., :n] - cumulative[..., self.route_end])
+        # machine time per good piece compared to a perfect step
+        self.time_factor = self.quantity_factor * (1 + rework)
+        self.startup_hours = startup * self.batch_hours
+        return self
+
+    def with_rates(self, scrap=None, rework=None, startup=None):
+        # a copy with some of the rates replaced
+        return copy.copy(self).set_rates(self.scrap if scrap is None else scrap,
+                                         self.rework if rework is None else rework,
+                                         self.startup if startup is None else startup)
+
+    def piece_time(self, idle_time, process_time):
+        # machine hours per good piece of every routing step
+        return idle_time * self.quantity_factor + process_time * self.time_factor
+
+    def effective_quantity(self, quantity):
+        # pieces every routing step has to make for quantity (one value per part) good pieces
+        part = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        return Ragged(self.offsets, np.asarray(quantity, dtype=np.float64)[part] * self.quantity_factor)
+
+    def step_hours(self, ordered_part, quantity=None):
+        # machine hours per routing step with one setup per part, the quality adjusted
+        # total_machine_time_all_parts
+        operations = ordered_part.operations
+        quantity = ordered_part.total_quantity if quantity is None else quantity
+        pieces = self.effective_quantity(quantity).values
+        hours = (pieces * operations.avg_idle_time + pieces * (1 + self.rework) * operations.process_time
+                 + operations.setup_time + self.startup_hours)
+        return Ragged(self.offsets, hours)
+
+    def demand_index(self, ordered_part):
+        # DemandIndex with the quality adjusted times, for OEE and the daily planning
+        return DemandIndex.from_ordered_part(ordered_part, self)
+
+
+if __name__ == "__main__":
+    from make_json_ordered_parts import load_ordered_parts
+
+    ordered_part = load_ordered_parts()
+    yields = YieldModel(ordered_part)
+    for i in range(5):
+        print(ordered_part.part_id[i], list(ordered_part.route[i]),
+              np.round(yields.effective_quantity(ordered_part.total_quantity)[i], 1),
+              ordered_part.total_quantity[i])
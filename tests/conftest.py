@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+SCRIPTS = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "Job's Scripts"))
+sys.path.insert(0, SCRIPTS)
+
+
+@pytest.fixture
+def in_scripts(monkeypatch):
+    # the scripts read their data from ../data relative to their own folder
+    monkeypatch.chdir(SCRIPTS)
@@ -0,0 +1,13 @@
+import pytest
+
+
+def assert_nested_close(built, stored):
+    # lists of lists of numbers, None and strings, floats compared with pytest.approx
+    assert len(built) == len(stored)
+    for a, b in zip(built, stored):
+        if isinstance(b, list):
+            assert_nested_close(a, b)
+        elif b is None or isinstance(b, str):
+            assert a == b
+        else:
+            assert a == pytest.approx(b)
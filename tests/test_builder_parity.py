@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+from helpers import assert_nested_close
+
+# data/ordered_part.json as the original builder wrote it, before this builder rewrote it
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "data", "ordered_part_baseline.json")
+# every (field, index) the builder may write differently from the baseline, everything else is the same:
+# the 3069 pieces of AGR-042-02 the old builder lost when it summed the BOM totals, and the pieces
+# they take of AGR-018-01
+ALLOWED_DIFFERENCES = {
+    ("total_quantity", 41),
+    ("total_machine_time_all_parts", 41),
+    ("total_time_all_parts", 41),
+    ("total_sub_part_quantity", 17),
+}
+# checked on their own in test_stock_size
+OWN_TESTS = {"stock_size"}
+
+
+def without_allowed(field, values):
+    return [v for i, v in enumerate(values) if (field, i) not in ALLOWED_DIFFERENCES]
+
+
+@pytest.fixture(scope="module")
+def built_and_baseline():
+    from make_json_ordered_parts import build_ordered_part, class_to_dict
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    cwd = os.getcwd()
+    os.chdir(os.path.join(os.path.dirname(__file__), os.pardir, "Job's Scripts"))
+    try:
+        return class_to_dict(build_ordered_part()), baseline
+    finally:
+        os.chdir(cwd)
+
+
+def test_same_fields(built_and_baseline):
+    built, baseline = built_and_baseline
+    assert set(built) == set(baseline)
+
+
+@pytest.mark.parametrize("field", [
+    "part_id", "price", "route", "route_number", "max_transport_batch", "setup_time", "process_time", "idle_time",
+    "avg_idle_time", "total_machine_time_all_parts", "total_time_all_parts", "total_quantity",
+    "total_sub_part_quantity", "is_main_assembly", "sub_part_id", "max_assembly_batch", "quantity_of_sub_part",
+])
+def test_field(built_and_baseline, field):
+    built, baseline = built_and_baseline
+    assert len(built[field]) == len(baseline[field])
+    assert_nested_close(without_allowed(field, built[field]), without_allowed(field, baseline[field]))
+
+
+def test_orders(built_and_baseline):
+    built, baseline = built_and_baseline
+    assert set(built["orders"]) == set(baseline["orders"])
+    for key, values in baseline["orders"].items():
+        assert_nested_close(built["orders"][key], values)
+
+
+def test_allowed_differences(built_and_baseline):
+    # the BOM totals of AGR-042-02 now count all of its orders, the rest of its part of the tree follows
+    built, baseline = built_and_baseline
+    assert built["part_id"][41] == "AGR-042-02"
+    assert (built["total_quantity"][41], baseline["total_quantity"][41]) == (4952, 1883)
+    # the setups do not grow with the pieces, so the hours grow a little less than the quantity
+    assert baseline["total_time_all_parts"][41] < built["total_time_all_parts"][41] \
+        < baseline["total_time_all_parts"][41] * 4952 / 1883
+    for new, old in zip(built["total_machine_time_all_parts"][41], baseline["total_machine_time_all_parts"][41]):
+        assert old < new <= old * 4952 / 1883
+    # only the first parent of AGR-018-01 changes, by the same 3069 pieces
+    assert built["part_id"][17] == "AGR-018-01"
+    assert built["total_sub_part_quantity"][17][0] - baseline["total_sub_part_quantity"][17][0] == 4952 - 1883
+    assert_nested_close(built["total_sub_part_quantity"][17][1:], baseline["total_sub_part_quantity"][17][1:])
+
+
+def test_stock_size(built_and_baseline):
+    # the old builder dropped the missing size of AGR-053-01 and shifted every later part up by
+    # one; the builder keeps None in its place, and the baseline is that list without it
+    built, baseline = built_and_baseline
+    missing = built["part_id"].index("AGR-053-01")
+    assert built["stock_size"][missing] is None
+    assert len(baseline["stock_size"]) == len(built["part_id"]) - 1
+    assert built["stock_size"][:missing] + built["stock_size"][missing + 1:] == baseline["stock_size"]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def planning_and_order(in_scripts):
+    # the planning of the real orders and one order of the main assembly AGR-053-01, which
+    # passes its pieces down the whole tree below it
+    from daily_demand import IncrementalPlanning
+    from make_json_ordered_parts import ORDERS_PATH, build_ordered_part
+
+    orders = pd.read_csv(ORDERS_PATH)
+    row = orders[orders["Part number"] == "AGR-053-01"].iloc[2]
+    return IncrementalPlanning(build_ordered_part().compact()), orders, row
+
+
+def test_remove_order_matches_rebuild(planning_and_order, tmp_path):
+    from daily_demand import route_time
+    from make_json_ordered_parts import PORTFOLIO_PATH, build_ordered_part
+
+    planning, orders, row = planning_and_order
+    hours = planning.hours.copy()
+    planning.remove_order(int(row["Order number"]))
+    assert not np.allclose(planning.hours, hours)
+
+    path = tmp_path / "orders.csv"
+    orders[orders["Order number"] != row["Order number"]].to_csv(path, index=False)
+    rebuilt = build_ordered_part(PORTFOLIO_PATH, str(path)).compact()
+    np.testing.assert_allclose(planning.route_time, route_time(rebuilt, planning.days), rtol=1e-9, atol=1e-9)
+
+
+def test_add_order_restores_planning(planning_and_order):
+    planning, _, row = planning_and_order
+    hours = planning.hours.copy()
+    number = int(row["Order number"])
+    planning.remove_order(number)
+    planning.add_order(number, row["Part number"], int(row["Number of parts"]), row["Order date"],
+                       row["Desired delivery date"])
+    np.testing.assert_allclose(planning.hours, hours, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("change", [
+    {"delivery_date": "2020-01-01"},
+    {"part_id": "no such part"},
+])
+def test_invalid_update_leaves_planning(planning_and_order, change):
+    planning, _, row = planning_and_order
+    number = int(row["Order number"])
+    hours, quantity, count, orders = planning.hours.copy(), planning.quantity.copy(), planning.count.copy(), \
+        dict(planning.orders)
+
+    with pytest.raises(ValueError):
+        planning.update_order(number, **change)
+    np.testing.assert_array_equal(planning.hours, hours)
+    np.testing.assert_array_equal(planning.quantity, quantity)
+    np.testing.assert_array_equal(planning.count, count)
+    assert planning.orders == orders
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from order_index import IntervalIndex
+
+
+def brute_force(start, end, first, last):
+    return np.flatnonzero((start <= last) & (end >= first))
+
+
+@pytest.mark.parametrize("leaf_size", [1, 2, 4, 64])
+@pytest.mark.parametrize("n", [0, 1, 7, 300])
+def test_matches_brute_force(leaf_size, n):
+    # short and long intervals with repeated endpoints, queried inside, around and outside them;
+    # the small leaves make the tree deep so every branch of overlapping is taken
+    rng = np.random.default_rng(leaf_size * 1000 + n)
+    start = rng.integers(0, 100, n)
+    end = start + np.where(rng.random(n) < 0.8, rng.integers(0, 5, n), rng.integers(0, 60, n))
+    index = IntervalIndex(start, end, leaf_size=leaf_size)
+    assert len(index) == n
+
+    for _ in range(200):
+        first = int(rng.integers(-10, 170))
+        last = first + int(rng.integers(0, 30))
+        np.testing.assert_array_equal(index.overlapping(first, last), brute_force(start, end, first, last))
+    for day in range(-2, 172):
+        np.testing.assert_array_equal(index.containing(day), brute_force(start, end, day, day))
+
+
+def test_dates_and_days_agree():
+    rng = np.random.default_rng(0)
+    start = np.datetime64("2025-07-01") + rng.integers(0, 90, 50)
+    end = start + rng.integers(0, 20, 50)
+    by_date = IntervalIndex(start, end, leaf_size=2)
+    by_day = IntervalIndex(start.astype(np.int64), end.astype(np.int64), leaf_size=2)
+    for day in start:
+        np.testing.assert_array_equal(by_date.containing(day), by_day.containing(int(day.astype(np.int64))))
+        np.testing.assert_array_equal(by_date.overlapping(str(day), day + 10), brute_force(start, end, day, day + 10))
+
+
+def test_interval_ending_before_start():
+    with pytest.raises(ValueError):
+        IntervalIndex([3, 5], [4, 4])
@@ -0,0 +1,22 @@
+import numpy as np
+
+
+def test_order_without_pieces(in_scripts):
+    # an order of 0 pieces is done at its release and holds up neither its sub-parts nor the result
+    from make_json_ordered_parts import load_ordered_parts
+    from simulation import ShopFloorSimulation, own_orders
+
+    ordered_part = load_ordered_parts()
+    orders = own_orders(ordered_part)
+    part = ordered_part.part_id.index("AGR-053-01")
+    orders = orders[orders["part"] == part].head(2).reset_index(drop=True)
+    orders.loc[0, "quantity"] = 0
+    machine_quantity = {str(m): 1 for m in ordered_part.operations.route}
+
+    result = ShopFloorSimulation(ordered_part, machine_quantity).run(orders)
+    released = orders["order_date"].to_numpy().astype("datetime64[D]") + 1
+    assert result.orders["completion"].iloc[0] == released[0]
+    assert result.orders["lead_time_days"].iloc[0] == 1
+    assert result.orders["completion"].iloc[1] > released[1]
+    assert np.all(np.isfinite(result.orders["lead_time_days"]))
+    assert result.throughput.sum() == orders["quantity"].sum()
@@ -0,0 +1,17 @@
+import json
+import os
+
+
+def test_round_trip(in_scripts, tmp_path):
+    # every field comes back from the .npy columns as it was built, the manifest only holds metadata
+    from make_json_ordered_parts import build_ordered_part, class_to_dict
+    from snapshot import read_snapshot, write_snapshot
+
+    ordered_part = build_ordered_part()
+    write_snapshot(ordered_part, str(tmp_path))
+    assert class_to_dict(read_snapshot(str(tmp_path))) == class_to_dict(ordered_part)
+    assert any(ordered_part.orders.parent_quantity)
+
+    with open(os.path.join(tmp_path, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert set(manifest) == {"format", "version", "columns", "sources"}
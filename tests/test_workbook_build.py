@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from helpers import assert_nested_close
+
+
+@pytest.fixture
+def csv_and_workbook(in_scripts):
+    # both builds as they come out of the builder, before compact() turns the dates into columns
+    from make_json_ordered_parts import build_ordered_part, build_ordered_part_from_workbook, class_to_dict
+
+    return class_to_dict(build_ordered_part()), class_to_dict(build_ordered_part_from_workbook())
+
+
+def test_orders_are_identical(csv_and_workbook):
+    from_csv, from_workbook = csv_and_workbook
+    assert from_workbook["orders"] == from_csv["orders"]
+
+
+def test_parts_match(csv_and_workbook):
+    from_csv, from_workbook = csv_and_workbook
+    assert set(from_workbook) == set(from_csv)
+    for field, values in from_csv.items():
+        if field == "orders":
+            continue
+        # the csv export rounds the last digit of some times and prices
+        assert_nested_close(from_workbook[field], values)
+
+
+def test_workbook_build_survives_json(in_scripts, tmp_path):
+    from make_json_ordered_parts import build_ordered_part_from_workbook, read_json, write_json
+
+    path = tmp_path / "ordered_part.json"
+    write_json(build_ordered_part_from_workbook(), path)
+    with open(path) as f:
+        assert json.load(f)["orders"]["order_date"][0][0] == "2025-07-21"
+    ordered_part = read_json(path).compact()
+    assert len(ordered_part.orders.table.order_date) > 0